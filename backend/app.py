@@ -15,9 +15,9 @@ from whatsapp_notify import send_whatsapp_notification, send_deadline_reminder_w
 from onesignal_notify import send_onesignal_notification
 from fcm_notify import send_fcm_notification
 from google_auth_oauthlib.flow import Flow
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from urllib.parse import urlencode
-from chat_handler import chat_with_deadlines, get_llm_status
+from chat_handler import chat_with_deadlines, stream_chat_with_deadlines, get_llm_status, load_chat_tasks
 import requests
 import os
 
@@ -30,7 +30,7 @@ def periodic_gmail_ingest():
     db = SessionLocal()
     try:
         print("Running scheduled Gmail ingestion...")
-        ingest_gmail_tasks(db)
+        ingest_gmail_tasks(db, due_only=True)
     except Exception as e:
         print(f"Error in scheduled Gmail ingestion: {e}")
     finally:
@@ -48,6 +48,25 @@ def periodic_whatsapp_ingest():
     finally:
         db.close()
 
+def startup_ollama_warmup():
+    from llm_provider import warm_up_ollama
+    try:
+        print("Warming up Ollama model...")
+        warm_up_ollama()
+    except Exception as e:
+        print(f"Error warming up Ollama model: {e}")
+
+def periodic_ledger_prune():
+    from message_ledger import prune_ledger
+    db = SessionLocal()
+    try:
+        removed = prune_ledger(db)
+        print(f"Pruned {removed} processed-message ledger entries")
+    except Exception as e:
+        print(f"Error pruning processed-message ledger: {e}")
+    finally:
+        db.close()
+
 def periodic_due_soon_check():
     db = SessionLocal()
     try:
@@ -63,8 +82,9 @@ async def lifespan(app: FastAPI):
     # Start scheduler
     scheduler = BackgroundScheduler()
     
-    # Ingest Gmail every 15 minutes
-    scheduler.add_job(periodic_gmail_ingest, 'interval', minutes=15)
+    # Tick at the shortest Gmail polling interval; each account is synced on its own adaptive schedule
+    from gmail_schedule import GMAIL_POLL_MIN_MINUTES
+    scheduler.add_job(periodic_gmail_ingest, 'interval', minutes=GMAIL_POLL_MIN_MINUTES)
     
     # Check for due tasks every 5 minutes
     scheduler.add_job(periodic_due_soon_check, 'interval', minutes=5)
@@ -72,6 +92,13 @@ async def lifespan(app: FastAPI):
     # Ingest WhatsApp every 30 minutes (if configured)
     scheduler.add_job(periodic_whatsapp_ingest, 'interval', minutes=30)
     
+    # Drop processed-message ledger entries past their TTL once a day
+    scheduler.add_job(periodic_ledger_prune, 'interval', hours=24)
+    
+    # Load the local model once at startup so the first extraction isn't a cold start
+    if os.getenv("OLLAMA_WARMUP", "false").lower() == "true":
+        scheduler.add_job(startup_ollama_warmup)
+    
     scheduler.start()
     print("Background scheduler started.")
     
@@ -80,6 +107,10 @@ async def lifespan(app: FastAPI):
     # Shutdown scheduler
     scheduler.shutdown()
     print("Background scheduler shut down.")
+    
+    # Close the shared WhatsApp Web browser, if one was opened
+    from whatsapp_ingest import get_whatsapp_session
+    get_whatsapp_session().close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -222,6 +253,12 @@ def manual_sync(db: Session = Depends(get_db)):
         "status": "Sync complete"
     }
 
+@app.get("/whatsapp/session")
+def whatsapp_session_status():
+    """State of the shared WhatsApp Web browser session"""
+    from whatsapp_ingest import get_whatsapp_session
+    return get_whatsapp_session().status()
+
 @app.post("/ingest/whatsapp")
 def ingest_whatsapp(chat_name: str, db: Session = Depends(get_db)):
     results = ingest_whatsapp_tasks(db, chat_name)
@@ -427,6 +464,8 @@ def delete_account(account_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Account not found")
     db.delete(account)
     db.commit()
+    from gmail_service_cache import get_gmail_service_cache
+    get_gmail_service_cache().invalidate(account_id)
     return {"status": "deleted"}
 
 # WhatsApp Notification Endpoints
@@ -586,13 +625,59 @@ def llm_status():
     """Check which LLM providers are available and get suggested questions"""
     return get_llm_status()
 
+@app.get("/llm/cache")
+def llm_cache_stats():
+    """Extraction cache hit/miss counters"""
+    from llm_deadline_extractor import get_extraction_cache_stats
+    return get_extraction_cache_stats()
+
+@app.get("/llm/prefilter")
+def llm_prefilter_stats():
+    """Pre-filter counters (LLM calls skipped for texts with no deadline signal)"""
+    from llm_deadline_extractor import get_prefilter_stats
+    return get_prefilter_stats()
+
+@app.get("/llm/metrics")
+def llm_metrics():
+    """Per-provider latency histograms, token usage, fallbacks and JSON-parse failures"""
+    from llm_deadline_extractor import get_llm_metrics_snapshot
+    return get_llm_metrics_snapshot()
+
+@app.get("/llm/replay")
+def llm_replay_stats():
+    """Replay provider hits, misses and injected failures (LLM_PROVIDER=replay)"""
+    from llm_deadline_extractor import get_replay_stats
+    return get_replay_stats()
+
+@app.get("/llm/warmup")
+def llm_warmup_status():
+    """Cold vs warm start latency from the last Ollama warm-up"""
+    from llm_provider import get_ollama_warmup_status
+    return get_ollama_warmup_status()
+
+@app.post("/llm/warmup")
+def llm_warmup():
+    """Load the Ollama model now and measure cold vs warm start latency"""
+    from llm_provider import warm_up_ollama
+    return warm_up_ollama()
+
 @app.post("/chat")
 def chat_endpoint(question: str, db: Session = Depends(get_db)):
     """Chat with your deadlines using LLM"""
-    tasks = db.query(Task).all()
+    tasks = load_chat_tasks(db)
     response = chat_with_deadlines(question, tasks)
     return response
 
+@app.post("/chat/stream")
+def chat_stream_endpoint(question: str, db: Session = Depends(get_db)):
+    """Chat with your deadlines, streaming the answer as server-sent events"""
+    tasks = load_chat_tasks(db)
+    return StreamingResponse(
+        stream_chat_with_deadlines(question, tasks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     # Bind to loopback for local-only access by default
@@ -3,54 +3,321 @@ Chat handler for deadline queries using LLM
 Supports Groq (cloud), Ollama (local), and regex fallback
 """
 
-from typing import List, Dict
-from datetime import datetime
-from llm_provider import get_llm_provider, check_all_providers
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from llm_provider import get_llm_provider, get_provider_registry, check_all_providers, estimate_tokens, RegexProvider
+from llm_metrics import get_llm_metrics
 
-def build_context_from_tasks(tasks: List) -> str:
-    """Build context string from tasks for LLM"""
+# Approximate prompt budget for the task list in a chat request
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+# Tasks whose deadline passed more than this many days ago are not loaded
+CHAT_CONTEXT_PAST_DAYS = int(os.getenv("CHAT_CONTEXT_PAST_DAYS", "30"))
+
+_ISO_DEADLINE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{1,2}:\d{2})?")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "do", "does", "i", "me", "my", "have", "has", "any", "what", "when",
+    "which", "show", "all", "of", "for", "to", "in", "on", "at", "and", "or", "due", "deadline", "deadlines",
+    "task", "tasks", "this", "next", "week", "month", "from", "about", "tell", "list", "there", "s",
+}
+
+def load_chat_tasks(db) -> List:
+    """
+    Load only the tasks worth putting in a chat prompt
+    
+    Completed tasks are filtered out in SQL, as are tasks with an ISO
+    deadline more than CHAT_CONTEXT_PAST_DAYS in the past. Free-text
+    deadlines can't be compared in SQL and are ranked in Python instead.
+    """
+    from sqlalchemy import or_, not_
+    from models import Task
+    
+    cutoff = (datetime.now() - timedelta(days=CHAT_CONTEXT_PAST_DAYS)).strftime("%Y-%m-%d")
+    return db.query(Task).filter(
+        or_(Task.alert_status.is_(None), Task.alert_status != "completed"),
+        or_(
+            Task.deadline.is_(None),
+            not_(Task.deadline.like("____-__-__%")),
+            Task.deadline >= cutoff,
+        ),
+    ).all()
+
+def _parse_deadline(value: Optional[str]) -> Optional[datetime]:
+    """Best-effort parse of a stored deadline string"""
+    if not value:
+        return None
+    match = _ISO_DEADLINE_RE.match(value.strip())
+    if match:
+        try:
+            return datetime.fromisoformat(match.group().replace("T", " "))
+        except ValueError:
+            return None
+    try:
+        import dateparser
+        parsed = dateparser.parse(value, settings={"PREFER_DATES_FROM": "future"})
+    except Exception:
+        return None
+    if parsed is not None and parsed.tzinfo is not None:
+        # Deadlines naming a timezone come back aware; rank them in naive local time
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _keywords(text: str) -> set:
+    return {w for w in _WORD_RE.findall((text or "").lower()) if w not in _STOPWORDS}
+
+def _task_score(task, question_words: set, now: datetime) -> float:
+    """Higher for pending tasks, near deadlines and keyword overlap with the question"""
+    score = 0.0
+    due = _parse_deadline(task.deadline)
+    if due is not None:
+        days = (due - now).total_seconds() / 86400
+        if days >= 0:
+            score += 3.0 / (1.0 + days)
+        else:
+            # Recently overdue still matters, long overdue much less
+            score += 1.5 / (1.0 - days)
+    if getattr(task, "alert_status", "pending") == "pending":
+        score += 1.0
+    if question_words:
+        overlap = question_words & _keywords(f"{task.summary} {task.source or ''}")
+        score += 4.0 * len(overlap)
+    return score
+
+def _format_task(task) -> str:
+    task_str = f"- {task.summary}"
+    if task.deadline:
+        task_str += f" (Due: {task.deadline})"
+    if task.source:
+        task_str += f" [Source: {task.source}]"
+    return task_str
+
+def build_ranked_context(tasks: List, question: str = "", token_budget: Optional[int] = None) -> Tuple[str, int, int]:
+    """
+    Build the prompt context from the most relevant tasks
+    
+    Tasks are ranked by deadline proximity, pending status and keyword
+    overlap with the question, then added until the token budget is
+    spent. Returns (context, included_count, omitted_count).
+    """
     if not tasks:
-        return "No deadlines currently in the system."
+        return "No deadlines currently in the system.", 0, 0
+    
+    token_budget = token_budget or CHAT_CONTEXT_TOKEN_BUDGET
+    now = datetime.now()
+    question_words = _keywords(question)
+    ranked = sorted(tasks, key=lambda t: _task_score(t, question_words, now), reverse=True)
     
     context_parts = []
-    for task in tasks:
-        task_str = f"- {task.summary}"
-        if task.deadline:
-            task_str += f" (Due: {task.deadline})"
-        if task.source:
-            task_str += f" [Source: {task.source}]"
+    used = 0
+    for task in ranked:
+        task_str = _format_task(task)
+        cost = estimate_tokens(task_str)
+        if context_parts and used + cost > token_budget:
+            break
         context_parts.append(task_str)
+        used += cost
+    
+    omitted = len(tasks) - len(context_parts)
+    context = "Current deadlines (most relevant first):\n" + "\n".join(context_parts)
+    if omitted:
+        context += f"\n({omitted} less relevant tasks omitted)"
+    return context, len(context_parts), omitted
+
+def build_context_from_tasks(tasks: List, question: str = "") -> str:
+    """Build context string from tasks for LLM"""
+    return build_ranked_context(tasks, question)[0]
+
+def task_set_checksum(tasks: List) -> str:
+    """Checksum of the fields that can change a chat answer"""
+    digest = hashlib.sha1()
+    for task in tasks:
+        digest.update(
+            f"{getattr(task, 'id', '')}|{task.summary}|{task.deadline}|{task.source}|"
+            f"{getattr(task, 'alert_status', '')}\n".encode("utf-8")
+        )
+    return digest.hexdigest()
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return " ".join((question or "").lower().split()).rstrip(" ?!.")
+
+class ChatAnswerCache:
+    """
+    LRU cache of chat answers
+    
+    Keyed by normalized question, provider, a checksum of the task set and
+    today's date, so any task change or a new day produces a new key and
+    stale answers simply age out of the LRU.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "256"))
+        self.enabled = os.getenv("CHAT_CACHE_ENABLED", "true").lower() != "false"
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def make_key(self, question: str, provider_name: str, tasks: List) -> Tuple:
+        return (normalize_question(question), provider_name, task_set_checksum(tasks), datetime.now().strftime("%Y-%m-%d"))
+    
+    def get(self, key: Tuple) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry)
     
-    return "Current deadlines:\n" + "\n".join(context_parts)
+    def put(self, key: Tuple, response: Dict) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = dict(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+_answer_cache = ChatAnswerCache()
+
+def get_chat_answer_cache() -> ChatAnswerCache:
+    """Return the process-wide chat answer cache"""
+    return _answer_cache
+
+def _chat_provider():
+    """The active provider; a misconfigured forced provider (e.g. groq without a key) degrades to regex"""
+    try:
+        return get_llm_provider()
+    except Exception as e:
+        print(f"LLM provider unavailable ({e}); using regex provider for chat")
+        get_llm_metrics().record_fallback(os.getenv("LLM_PROVIDER", "auto"), "regex")
+        return RegexProvider()
 
 def chat_with_deadlines(question: str, tasks: List) -> Dict:
     """
     Chat interface to query deadlines using best available LLM provider
     
-    Returns answer with provider information
+    Returns answer with provider information. Repeated questions over an
+    unchanged task set are answered from the chat answer cache.
     """
-    provider = get_llm_provider()
+    provider = _chat_provider()
+    cache_key = _answer_cache.make_key(question, provider.name, tasks)
+    cached = _answer_cache.get(cache_key)
+    if cached is not None:
+        cached["cached"] = True
+        return cached
     
     try:
         # Build context
-        context = build_context_from_tasks(tasks)
+        context, included, omitted = build_ranked_context(tasks, question)
         
         # Get answer from provider
         answer = provider.chat(question, context)
+        get_provider_registry().record_success(provider.name)
         
-        return {
+        response = {
             "answer": answer,
             "provider": provider.name,
-            "context_tasks": len(tasks)
+            "context_tasks": included,
+            "omitted_tasks": omitted
         }
+        _answer_cache.put(cache_key, response)
+        return {**response, "cached": False}
         
     except Exception as e:
+        get_provider_registry().record_failure(provider.name)
         return {
             "answer": f"Error generating response: {str(e)}",
             "provider": "error",
             "context_tasks": len(tasks)
         }
 
+def _sse_event(event: str, data: Dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat_with_deadlines(question: str, tasks: List) -> Iterator[str]:
+    """
+    Streaming variant of chat_with_deadlines as server-sent events
+    
+    Emits a `meta` event, one `token` event per chunk from the provider
+    (a single chunk for RegexProvider) and a final `done` event carrying
+    time_to_first_token_ms and total_ms.
+    """
+    provider = _chat_provider()
+    started = time.perf_counter()
+    first_token_ms = None
+    
+    cache_key = _answer_cache.make_key(question, provider.name, tasks)
+    cached = _answer_cache.get(cache_key)
+    if cached is not None:
+        yield _sse_event("meta", {"provider": provider.name, "context_tasks": cached["context_tasks"],
+                                  "omitted_tasks": cached["omitted_tasks"], "cached": True})
+        yield _sse_event("token", {"text": cached["answer"]})
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        yield _sse_event("done", {"provider": provider.name, "time_to_first_token_ms": elapsed_ms,
+                                  "total_ms": elapsed_ms, "cached": True})
+        return
+    
+    chunks = []
+    context = None
+    try:
+        context, included, omitted = build_ranked_context(tasks, question)
+        yield _sse_event("meta", {"provider": provider.name, "context_tasks": included, "omitted_tasks": omitted,
+                                  "cached": False})
+        
+        for token in provider.chat_stream(question, context):
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            chunks.append(token)
+            yield _sse_event("token", {"text": token})
+        get_provider_registry().record_success(provider.name)
+        _answer_cache.put(cache_key, {
+            "answer": "".join(chunks).strip(),
+            "provider": provider.name,
+            "context_tasks": included,
+            "omitted_tasks": omitted
+        })
+    except Exception as e:
+        # A context-building error says nothing about the provider's health
+        if context is not None:
+            get_provider_registry().record_failure(provider.name)
+        yield _sse_event("error", {"answer": f"Error generating response: {str(e)}", "provider": "error"})
+    
+    yield _sse_event("done", {
+        "provider": provider.name,
+        "time_to_first_token_ms": first_token_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "cached": False,
+    })
+
 def suggest_questions() -> List[str]:
     """Suggest example questions users can ask"""
     return [
@@ -64,13 +331,21 @@ def suggest_questions() -> List[str]:
 
 def get_llm_status() -> Dict:
     """Get status of all available LLM providers"""
-    provider = get_llm_provider()
+    try:
+        active = get_llm_provider().name
+        provider_error = None
+    except Exception as e:
+        # Chat and extraction fall back to regex in this case; status polls aren't counted as fallbacks
+        active = "regex"
+        provider_error = str(e)
     all_providers = check_all_providers()
     
     return {
-        "active_provider": provider.name,
+        "active_provider": active,
+        "provider_error": provider_error,
         "available_providers": all_providers,
-        "suggested_questions": suggest_questions()
+        "suggested_questions": suggest_questions(),
+        "chat_cache": _answer_cache.stats()
     }
 
 if __name__ == "__main__":
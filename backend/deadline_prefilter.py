@@ -0,0 +1,92 @@
+"""
+Cheap local pre-filter in front of LLM deadline extraction
+
+Scores a text on deadline keywords, date/time tokens and numbers so that
+chit-chat ("ok 👍") and newsletters never reach the LLM. Scoring is a few
+regex scans, i.e. microseconds per message.
+"""
+
+import os
+import re
+import threading
+from typing import Dict
+
+from regex_engine import DEADLINE_RE
+
+STRONG_KEYWORDS_RE = re.compile(
+    r"\b(?:deadline|due|submit(?:ted|ssion)?|assignment|homework|exam|quiz|test|"
+    r"last\s+date|register|registration|expires?|closes?|interview|apply|payment|fee)\b",
+    re.IGNORECASE,
+)
+WEAK_KEYWORDS_RE = re.compile(
+    r"\b(?:meeting|meet|schedule[d]?|before|by|until|till|reminder|remind|urgent|asap|"
+    r"project|presentation|class|lecture|call|event|rsvp)\b",
+    re.IGNORECASE,
+)
+NUMBER_RE = re.compile(r"\d")
+
+DATE_WEIGHT = 2.0
+STRONG_WEIGHT = 1.5
+WEAK_WEIGHT = 0.5
+NUMBER_WEIGHT = 0.5
+KEYWORD_CAP = 3.0
+
+
+def score_text(text: str) -> float:
+    """Heuristic likelihood that text mentions a deadline"""
+    if not text:
+        return 0.0
+    score = 0.0
+    if DEADLINE_RE.search(text):
+        score += DATE_WEIGHT
+    keywords = STRONG_WEIGHT * len(STRONG_KEYWORDS_RE.findall(text))
+    keywords += WEAK_WEIGHT * len(WEAK_KEYWORDS_RE.findall(text))
+    score += min(keywords, KEYWORD_CAP)
+    if NUMBER_RE.search(text):
+        score += NUMBER_WEIGHT
+    return score
+
+
+class DeadlinePrefilter:
+    """Decides whether a text is worth an LLM call and counts the calls saved"""
+
+    def __init__(self, threshold: float = None, enabled: bool = None):
+        self.threshold = threshold if threshold is not None else float(os.getenv("PREFILTER_THRESHOLD", "2.0"))
+        self.enabled = enabled if enabled is not None else os.getenv("PREFILTER_ENABLED", "true").lower() != "false"
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.passed = 0
+        self.skipped = 0
+
+    def should_extract(self, text: str) -> bool:
+        """True when the text scores at or above the threshold"""
+        if not self.enabled:
+            return True
+        keep = score_text(text) >= self.threshold
+        with self._lock:
+            self.checked += 1
+            if keep:
+                self.passed += 1
+            else:
+                self.skipped += 1
+        return keep
+
+    def stats(self) -> Dict:
+        """Counters for tuning the threshold"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "checked": self.checked,
+                "passed": self.passed,
+                "llm_calls_saved": self.skipped,
+                "skip_rate": round(self.skipped / self.checked, 3) if self.checked else 0.0,
+            }
+
+
+_prefilter = DeadlinePrefilter()
+
+
+def get_prefilter() -> DeadlinePrefilter:
+    """Return the process-wide pre-filter"""
+    return _prefilter
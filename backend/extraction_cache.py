@@ -0,0 +1,172 @@
+"""
+Persistent content-addressed cache for deadline extraction results
+
+Entries are keyed by a hash of (normalized text, provider, model, prompt
+version) and stored in a small SQLite file next to tasks.db, so re-scanning
+the same Gmail/WhatsApp messages does not pay for another LLM call.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_CACHE_PATH = (BASE_DIR / "extraction_cache.db").as_posix()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies share a cache entry"""
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def make_cache_key(text: str, provider: str, model: str, prompt_version: str) -> str:
+    """Content address for one extraction request"""
+    payload = "\x1f".join([prompt_version, provider, model, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """SQLite-backed extraction cache with size- and age-based eviction"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, evict_every: int = 100):
+        self.path = path or os.getenv("EXTRACTION_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else float(os.getenv("EXTRACTION_CACHE_MAX_AGE_DAYS", "30")) * 86400
+        self.evict_every = evict_every
+        self.enabled = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() != "false"
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS extraction_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_extraction_cache_last_used ON extraction_cache (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Return the cached deadlines for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT result, created_at FROM extraction_cache WHERE key = ?", (key,)
+                ).fetchone()
+                now = time.time()
+                if row is None or now - row[1] > self.max_age_seconds:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE extraction_cache SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Extraction cache read failed: {e}")
+                self.misses += 1
+                return None
+
+    def put(self, key: str, provider: str, model: str, deadlines: List[Dict]) -> None:
+        """Store an extraction result and evict old entries periodically"""
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO extraction_cache (key, provider, model, result, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, json.dumps(deadlines), now, now),
+                )
+                conn.commit()
+                self.stores += 1
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= self.evict_every:
+                    self._evict(conn)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"Extraction cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        self._writes_since_evict = 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = conn.execute("DELETE FROM extraction_cache WHERE created_at < ?", (cutoff,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM extraction_cache WHERE key IN ("
+            "SELECT key FROM extraction_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        conn.commit()
+        self.evictions += removed
+
+    def evict(self) -> None:
+        """Run eviction now"""
+        with self._lock:
+            self._evict(self._connect())
+
+    def clear(self) -> None:
+        """Remove every cached entry"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM extraction_cache")
+            conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "max_age_days": round(self.max_age_seconds / 86400, 2),
+        }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Return the process-wide extraction cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
@@ -0,0 +1,92 @@
+"""
+Plain-text bodies from Gmail API message payloads
+
+walk_text_parts() goes through a format=full payload lazily, one MIME part
+at a time. It skips attachments, picks text/plain over text/html inside
+multipart/alternative, and decodes only until the byte cap is reached, so a
+newsletter with a large HTML body or inline images costs no more than the
+cap.
+"""
+
+import base64
+import html
+import os
+import re
+from typing import Dict, Iterator, Tuple
+
+GMAIL_BODY_MAX_BYTES = int(os.getenv("GMAIL_BODY_MAX_BYTES", "8000"))
+
+_DROP_BLOCKS_RE = re.compile(r"<(script|style|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BREAK_TAGS_RE = re.compile(r"<(?:br|/p|/div|/tr|/li|/h[1-6])\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACES_RE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def strip_html(markup: str) -> str:
+    """Cheap HTML to text: drop scripts/styles, turn block ends into newlines, remove tags"""
+    text = _DROP_BLOCKS_RE.sub(" ", markup)
+    text = _BREAK_TAGS_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub(" ", text))
+    text = _SPACES_RE.sub(" ", text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def _is_attachment(part: Dict) -> bool:
+    if part.get("filename") or part.get("body", {}).get("attachmentId"):
+        return True
+    for header in part.get("headers", []):
+        if header.get("name", "").lower() == "content-disposition" and header.get("value", "").lower().startswith("attachment"):
+            return True
+    return False
+
+
+def _decode(data: str, max_bytes: int) -> str:
+    # base64url encodes 3 bytes per 4 characters; decode only what the cap allows
+    if max_bytes is not None:
+        data = data[:((max_bytes + 2) // 3) * 4]
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    return raw.decode("utf-8", errors="replace")
+
+
+def walk_text_parts(part: Dict) -> Iterator[Tuple[str, Dict]]:
+    """Yield (mime type, part) for the readable, non-attachment text parts in order"""
+    mime = (part.get("mimeType") or "").lower()
+    if _is_attachment(part):
+        return
+    children = part.get("parts") or []
+    if mime.startswith("multipart/"):
+        if mime == "multipart/alternative":
+            # Same content in several forms: the plain one is cheaper to use
+            preferred = sorted(children, key=lambda p: 0 if (p.get("mimeType") or "").lower() == "text/plain" else 1)
+            for child in preferred:
+                found = False
+                for item in walk_text_parts(child):
+                    found = True
+                    yield item
+                if found:
+                    return
+            return
+        for child in children:
+            yield from walk_text_parts(child)
+        return
+    if mime in ("text/plain", "text/html") and part.get("body", {}).get("data"):
+        yield mime, part
+
+
+def extract_body_text(payload: Dict, max_bytes: int = None) -> str:
+    """Readable text of a message payload, decoded up to max_bytes"""
+    max_bytes = max_bytes or GMAIL_BODY_MAX_BYTES
+    pieces = []
+    used = 0
+    for mime, part in walk_text_parts(payload):
+        remaining = max_bytes - used
+        if remaining <= 0:
+            break
+        text = _decode(part["body"]["data"], remaining)
+        used += len(text.encode("utf-8"))
+        if mime == "text/html":
+            text = strip_html(text)
+        if text.strip():
+            pieces.append(text.strip())
+    return "\n\n".join(pieces)
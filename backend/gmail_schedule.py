@@ -0,0 +1,69 @@
+"""
+Adaptive per-account Gmail polling intervals
+
+The scheduler ticks every GMAIL_POLL_MIN_MINUTES and only syncs accounts
+whose next_sync_at has passed. After each sync the account's interval
+moves toward where deadlines actually show up:
+
+- new tasks found          -> interval halves (down to the minimum)
+- new mail, no deadlines   -> interval unchanged
+- nothing new              -> interval grows by GMAIL_POLL_GROWTH (up to the maximum)
+- unfinished page cursor   -> next sync at the minimum interval
+- error                    -> exponential backoff from the current interval
+
+Successful syncs reset the error count. An account whose previous sync is
+still running is skipped by service.ingest_all_gmail_accounts (in-flight
+set), not held back through next_sync_at.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+GMAIL_POLL_MIN_MINUTES = float(os.getenv("GMAIL_POLL_MIN_MINUTES", "5"))
+GMAIL_POLL_MAX_MINUTES = float(os.getenv("GMAIL_POLL_MAX_MINUTES", "240"))
+GMAIL_POLL_DEFAULT_MINUTES = float(os.getenv("GMAIL_POLL_DEFAULT_MINUTES", "15"))
+GMAIL_POLL_GROWTH = float(os.getenv("GMAIL_POLL_GROWTH", "1.5"))
+
+
+def _clamp(minutes: float) -> float:
+    return min(GMAIL_POLL_MAX_MINUTES, max(GMAIL_POLL_MIN_MINUTES, minutes))
+
+
+def current_interval(account) -> float:
+    """The account's learned interval in minutes (default for new accounts)"""
+    return _clamp(account.poll_interval_minutes or GMAIL_POLL_DEFAULT_MINUTES)
+
+
+def is_due(account, now: datetime = None) -> bool:
+    """True when the account has never been scheduled or its next sync has passed"""
+    now = now or datetime.now()
+    return account.next_sync_at is None or account.next_sync_at <= now
+
+
+def next_poll_interval(interval: float, listed: int, new_tasks: int) -> float:
+    """Adapt an interval (minutes) to one sync's activity and yield"""
+    if new_tasks:
+        return _clamp(interval / 2)
+    if listed:
+        return _clamp(interval)
+    return _clamp(interval * GMAIL_POLL_GROWTH)
+
+
+def record_success(account, listed: int, new_tasks: int, now: datetime = None) -> None:
+    """Update the account's schedule after a successful sync (caller commits)"""
+    now = now or datetime.now()
+    interval = next_poll_interval(current_interval(account), listed, new_tasks)
+    account.poll_interval_minutes = interval
+    account.consecutive_errors = 0
+    # A listing cut short by the per-cycle budget continues as soon as possible
+    delay = GMAIL_POLL_MIN_MINUTES if account.gmail_page_cursor else interval
+    account.next_sync_at = now + timedelta(minutes=delay)
+
+
+def record_error(account, now: datetime = None) -> float:
+    """Back off exponentially after a failed sync; returns the delay in minutes (caller commits)"""
+    now = now or datetime.now()
+    account.consecutive_errors = (account.consecutive_errors or 0) + 1
+    delay = min(GMAIL_POLL_MAX_MINUTES, current_interval(account) * (2 ** account.consecutive_errors))
+    account.next_sync_at = now + timedelta(minutes=delay)
+    return delay
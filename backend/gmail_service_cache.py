@@ -0,0 +1,149 @@
+"""
+Per-account cache of Gmail API credentials
+
+Building a Gmail client costs a token-endpoint round trip plus discovery
+document processing. GmailServiceCache keeps the credentials of each
+EmailAccount, refreshing the access token only when it is about to
+expire, and loads the Gmail discovery document once per process. Every
+get() builds a fresh client on its own httplib2 transport, because
+httplib2 is not thread-safe and concurrent syncs (scheduler, /sync,
+parallel workers) must not share one connection. An entry is dropped when
+the account's refresh token changes, when the account is deleted or
+deactivated, or when a refresh fails.
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from llm_metrics import track
+
+# Refresh access tokens this many seconds before Google's expiry
+GMAIL_TOKEN_REFRESH_MARGIN = float(os.getenv("GMAIL_TOKEN_REFRESH_MARGIN", "300"))
+
+
+def _fingerprint(refresh_token: str) -> str:
+    return hashlib.sha256((refresh_token or "").encode("utf-8")).hexdigest()
+
+
+class _CachedCredentials:
+    __slots__ = ("fingerprint", "credentials", "lock")
+
+    def __init__(self, fingerprint: str, credentials):
+        self.fingerprint = fingerprint
+        self.credentials = credentials
+        self.lock = threading.Lock()
+
+
+class GmailServiceCache:
+    """Thread-safe map of account id -> credentials, handing out per-caller Gmail clients"""
+
+    def __init__(self, client_id: str = None, client_secret: str = None, scopes=None,
+                 refresh_margin: float = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scopes = scopes
+        self.refresh_margin = GMAIL_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self._entries: Dict[int, _CachedCredentials] = {}
+        self._lock = threading.Lock()
+        self._discovery: Optional[str] = None
+        self.builds = 0
+        self.refreshes = 0
+        self.hits = 0
+
+    def _needs_refresh(self, credentials) -> bool:
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth keeps expiry as naive UTC
+        return credentials.expiry - datetime.utcnow() < timedelta(seconds=self.refresh_margin)
+
+    def _discovery_document(self) -> str:
+        with self._lock:
+            if self._discovery is None:
+                # Bundled with google-api-python-client, so no network round trip
+                self._discovery = get_static_doc("gmail", "v1")
+            return self._discovery
+
+    def get(self, account):
+        """
+        A new authenticated Gmail client for an EmailAccount
+
+        The credentials are shared, the transport is not: use the returned
+        client from one thread only (one per sync).
+        """
+        fingerprint = _fingerprint(account.refresh_token)
+        with self._lock:
+            entry = self._entries.get(account.id)
+            if entry is None or entry.fingerprint != fingerprint:
+                credentials = Credentials(
+                    None,
+                    refresh_token=account.refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=self.client_id,
+                    client_secret=self.client_secret,
+                    scopes=self.scopes
+                )
+                entry = self._entries[account.id] = _CachedCredentials(fingerprint, credentials)
+            else:
+                self.hits += 1
+
+        # Per-account lock: concurrent syncs of one account refresh only once
+        with entry.lock:
+            if self._needs_refresh(entry.credentials):
+                try:
+                    with track("gmail", "token_refresh"):
+                        entry.credentials.refresh(Request())
+                except Exception:
+                    self.invalidate(account.id)
+                    raise
+                self.refreshes += 1
+
+        discovery = self._discovery_document()
+        with track("gmail", "build"):
+            # The client holds the shared credentials object, so later refreshes reach it too
+            service = build_from_document(discovery, http=AuthorizedHttp(entry.credentials, http=httplib2.Http()))
+        with self._lock:
+            self.builds += 1
+        return service
+
+    def invalidate(self, account_id: int) -> None:
+        with self._lock:
+            self._entries.pop(account_id, None)
+
+    def retain(self, active_account_ids: Iterable[int]) -> None:
+        """Drop entries for accounts that are no longer active"""
+        active = set(active_account_ids)
+        with self._lock:
+            for account_id in [a for a in self._entries if a not in active]:
+                del self._entries[account_id]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "accounts": len(self._entries),
+                "hits": self.hits,
+                "builds": self.builds,
+                "token_refreshes": self.refreshes,
+            }
+
+
+_cache: Optional[GmailServiceCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_gmail_service_cache(client_id: str = None, client_secret: str = None, scopes=None) -> GmailServiceCache:
+    """Return the process-wide cache, creating it with the OAuth client config on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GmailServiceCache(client_id, client_secret, scopes)
+        return _cache
@@ -0,0 +1,211 @@
+"""
+Incremental JSON parser for LLM deadline extraction output
+
+Models wrap their JSON in chatter, stop mid-array when they hit max_tokens
+and sometimes mention brackets in trailing prose. Instead of a greedy
+regex plus json.loads on the whole completion, DeadlineStreamParser tracks
+JSON structure character by character and emits each deadline object as
+soon as its closing brace arrives. It handles both output shapes:
+
+    [{"task": ..., "date": ..., "time": ...}, ...]           single message
+    {"1": [{...}, ...], "2": [...]}                          batched messages
+
+Objects are validated against the deadline schema before being emitted.
+"""
+
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class PartialDeadlines(list):
+    """
+    Deadlines recovered from output that stopped mid-array (e.g. at
+    max_tokens): every object is complete, but later ones may be missing,
+    so the list must not be cached as the text's full result
+    """
+
+
+def is_partial(deadlines) -> bool:
+    return isinstance(deadlines, PartialDeadlines)
+
+
+def validate_deadline(obj) -> Optional[Dict]:
+    """Return a cleaned deadline dict, or None if obj doesn't fit the schema"""
+    if not isinstance(obj, dict):
+        return None
+    task = obj.get("task")
+    date = obj.get("date")
+    if not isinstance(task, str) or not task.strip():
+        return None
+    if not isinstance(date, str) or not date.strip():
+        return None
+    time_value = obj.get("time")
+    if isinstance(time_value, str):
+        time_value = time_value.strip()
+        if time_value.lower() in ("", "null", "none", "hh:mm"):
+            time_value = None
+    elif time_value is not None:
+        time_value = None
+    return {"task": task.strip(), "date": date.strip(), "time": time_value}
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.key: Optional[str] = None
+
+
+class DeadlineStreamParser:
+    """
+    Feed completion text in chunks; get back (group_key, deadline) pairs
+
+    group_key is the message id for batched output and None for a plain
+    array. After close(), `truncated` tells whether the output stopped
+    before the root value was complete, and `complete_keys` lists the ids
+    whose arrays were fully received.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._root_check = False
+        self.done = False
+        self.truncated = False
+        self.found_root = False
+        self.invalid = 0
+        self.complete_keys: Set[str] = set()
+
+    def feed(self, chunk: str) -> List[Tuple[Optional[str], Dict]]:
+        """Consume more text and return the deadlines completed by it"""
+        if self.done or not chunk:
+            return []
+        self._buf += chunk
+        out: List[Tuple[Optional[str], Dict]] = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = buf[self._string_start:i]
+                i += 1
+                continue
+
+            if not self._stack:
+                # Looking for the root value; skip prose until a plausible one starts
+                if ch == "{":
+                    self._stack.append(_Frame("{", i))
+                elif ch == "[":
+                    self._stack.append(_Frame("[", i))
+                    self._root_check = True
+                i += 1
+                continue
+
+            if self._root_check:
+                if ch.isspace():
+                    i += 1
+                    continue
+                self._root_check = False
+                if ch not in "{]":
+                    # "[" in prose such as "[see below]": not our array
+                    self._stack.clear()
+                    continue
+
+            top = self._stack[-1]
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch == ":" and top.kind == "{":
+                top.key = self._last_string
+            elif ch in "{[":
+                self._stack.append(_Frame(ch, i))
+            elif ch in "}]":
+                frame = self._stack.pop()
+                emitted = self._close(frame, buf[frame.start:i + 1])
+                out.extend(emitted)
+                # A root object that held nothing useful was prose ("{name}"); keep looking
+                if not self._stack and (frame.kind == "[" or emitted or self.complete_keys):
+                    self.found_root = True
+                    self.done = True
+            i += 1
+
+        self._pos = i
+        return out
+
+    def _close(self, frame: _Frame, text: str) -> List[Tuple[Optional[str], Dict]]:
+        parent = self._stack[-1] if self._stack else None
+        if frame.kind == "[":
+            # An array directly under the root object is one message's result
+            if parent is not None and parent.kind == "{" and len(self._stack) == 1 and parent.key is not None:
+                self.complete_keys.add(parent.key)
+            return []
+
+        if parent is None:
+            # Root object: either the batch mapping (already emitted) or a lone deadline
+            if self.complete_keys:
+                return []
+            return self._emit(None, text, count_invalid=False)
+        if parent.kind != "[":
+            return []
+        if len(self._stack) == 1:
+            return self._emit(None, text)
+        grandparent = self._stack[-2]
+        if grandparent.kind == "{" and len(self._stack) == 2:
+            return self._emit(grandparent.key, text)
+        return []
+
+    def _emit(self, key: Optional[str], text: str, count_invalid: bool = True) -> List[Tuple[Optional[str], Dict]]:
+        try:
+            deadline = validate_deadline(json.loads(text))
+        except ValueError:
+            deadline = None
+        if deadline is None:
+            if count_invalid:
+                self.invalid += 1
+            return []
+        return [(key, deadline)]
+
+    def close(self) -> None:
+        """Mark the end of input; an unfinished root value means truncation"""
+        if not self.done and self._stack:
+            self.truncated = True
+            self.found_root = True
+        self.done = True
+
+    @property
+    def ok(self) -> bool:
+        """True when a complete root value was parsed without invalid objects"""
+        return self.found_root and not self.truncated and not self.invalid
+
+
+def parse_deadlines(text: str) -> Tuple[List[Dict], DeadlineStreamParser]:
+    """Parse a full completion; returns the deadlines and the parser state"""
+    parser = DeadlineStreamParser()
+    deadlines = [deadline for _, deadline in parser.feed(text)]
+    parser.close()
+    return deadlines, parser
+
+
+def parse_grouped_deadlines(text: str) -> Tuple[Dict[str, List[Dict]], DeadlineStreamParser]:
+    """Parse batched output into {message id: deadlines} for fully received ids"""
+    parser = DeadlineStreamParser()
+    grouped: Dict[str, List[Dict]] = {}
+    for key, deadline in parser.feed(text):
+        if key is not None:
+            grouped.setdefault(key, []).append(deadline)
+    parser.close()
+    return {key: grouped.get(key, []) for key in parser.complete_keys}, parser
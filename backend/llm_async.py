@@ -0,0 +1,163 @@
+"""
+Bounded-concurrency deadline extraction on a shared event loop
+
+The async provider clients keep pooled connections that belong to the loop
+they were created on, so all async LLM work runs on one long-lived loop in a
+background thread. Synchronous callers (APScheduler jobs, FastAPI sync
+endpoints) submit coroutines to it with run_async().
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llm_provider import LLMProvider, pack_batches
+from llm_metrics import get_llm_metrics
+from text_chunker import chunk_text, merge_deadlines
+from json_stream import PartialDeadlines, is_partial
+
+# Maximum number of in-flight LLM requests per aextract_deadlines_many() call
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Hedged extraction: fire a second provider when the first is slower than
+# its own LLM_HEDGE_PERCENTILE latency (clamped to the min/max delay)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "500"))
+LLM_HEDGE_MAX_DELAY_MS = float(os.getenv("LLM_HEDGE_MAX_DELAY_MS", "5000"))
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start (once) and return the background event loop"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="llm-async-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_async(coro, timeout: float = None):
+    """Run a coroutine on the shared loop and block until it finishes"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result(timeout)
+
+
+async def aextract_deadlines_many(provider: LLMProvider, texts: List[str],
+                                  concurrency: int = None) -> List[Optional[List[Dict]]]:
+    """
+    Extract deadlines from many texts concurrently, one list per text
+
+    Long texts are split into chunks (text_chunker) whose results are
+    merged back per text. Batching providers send one request per packed
+    batch of chunks; others send one request per chunk. At most
+    `concurrency` requests are in flight; the provider's token-bucket
+    limiter (rate_limit) paces the actual calls.
+
+    Texts whose request (or per-message retry) failed come back as None so
+    the caller can fall back for just those; if every request failed, the
+    first error is raised.
+    """
+    if not texts:
+        return []
+
+    semaphore = asyncio.Semaphore(concurrency or LLM_MAX_CONCURRENCY)
+
+    chunks: List[str] = []
+    owners: List[int] = []
+    for index, text in enumerate(texts):
+        for chunk in chunk_text(text):
+            chunks.append(chunk)
+            owners.append(index)
+
+    if provider.supports_batching:
+        groups = pack_batches(chunks)
+    else:
+        groups = [[index] for index in range(len(chunks))]
+
+    async def run_group(group: List[int]) -> List[List[Dict]]:
+        async with semaphore:
+            return await provider.aextract_batch_group([chunks[i] for i in group])
+
+    # A failed group only costs its own texts, not the other groups' results
+    group_results = await asyncio.gather(*(run_group(group) for group in groups), return_exceptions=True)
+    errors = [result for result in group_results if isinstance(result, BaseException)]
+    if errors and len(errors) == len(groups):
+        raise errors[0]
+    for error in errors:
+        print(f"{provider.name} extraction group failed: {error}")
+
+    per_text: List[List[Optional[List[Dict]]]] = [[] for _ in texts]
+    for group, deadlines_list in zip(groups, group_results):
+        if isinstance(deadlines_list, BaseException):
+            deadlines_list = [None] * len(group)
+        for index, deadlines in zip(group, deadlines_list):
+            per_text[owners[index]].append(deadlines)
+    # A text with any failed chunk has no complete result; a cut-off chunk makes the merge partial
+    merged: List[Optional[List[Dict]]] = []
+    for results in per_text:
+        if None in results:
+            merged.append(None)
+        elif any(is_partial(deadlines) for deadlines in results):
+            merged.append(PartialDeadlines(merge_deadlines(results)))
+        else:
+            merged.append(merge_deadlines(results))
+    return merged
+
+
+def hedge_delay(provider_name: str) -> float:
+    """Seconds to wait on provider_name before hedging, from its recent latency"""
+    observed = get_llm_metrics().percentile(provider_name, "extract", LLM_HEDGE_PERCENTILE)
+    # No samples yet: wait the maximum rather than doubling every early request
+    delay_ms = LLM_HEDGE_MAX_DELAY_MS if observed is None else observed
+    return min(LLM_HEDGE_MAX_DELAY_MS, max(LLM_HEDGE_MIN_DELAY_MS, delay_ms)) / 1000.0
+
+
+async def ahedged_extract(primary: LLMProvider, secondary: LLMProvider, text: str,
+                          delay: float = None) -> Tuple[List[Dict], LLMProvider, bool]:
+    """
+    Race primary against secondary, starting secondary only after `delay`
+
+    Returns (deadlines, winning provider, whether the hedge fired). The
+    first successful answer wins and the other request is cancelled; if
+    primary fails before the delay, secondary starts immediately. Raises
+    the last error when both fail.
+    """
+    delay = hedge_delay(primary.name) if delay is None else delay
+    first = asyncio.ensure_future(primary.aextract_deadlines(text))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done and first.exception() is None:
+        return first.result(), primary, False
+
+    second = asyncio.ensure_future(secondary.aextract_deadlines(text))
+    owners = {first: primary, second: secondary}
+    pending = {second} if done else {first, second}
+    error = first.exception() if done else None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), owners[task], True
+                error = task.exception()
+                print(f"Hedged extraction with {owners[task].name} failed: {error}")
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def hedged_extract(primary: LLMProvider, secondary: LLMProvider, text: str,
+                   delay: float = None) -> Tuple[List[Dict], LLMProvider, bool]:
+    """Blocking wrapper around ahedged_extract() for sync callers"""
+    return run_async(ahedged_extract(primary, secondary, text, delay))
+
+
+def extract_deadlines_many(provider: LLMProvider, texts: List[str], concurrency: int = None) -> List[Optional[List[Dict]]]:
+    """Blocking wrapper around aextract_deadlines_many() for sync callers"""
+    return run_async(aextract_deadlines_many(provider, texts, concurrency))
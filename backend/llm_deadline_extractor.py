@@ -4,8 +4,18 @@ Supports Groq (cloud), Ollama (local), and regex fallback
 """
 
 import os
-from typing import List, Dict
-from llm_provider import get_llm_provider, check_all_providers
+from typing import List, Dict, Optional
+from llm_provider import get_llm_provider, get_provider_registry, check_all_providers, EXTRACTION_PROMPT_VERSION
+from extraction_cache import get_extraction_cache, make_cache_key
+from llm_async import extract_deadlines_many, hedged_extract, LLM_HEDGE_ENABLED
+from deadline_prefilter import get_prefilter
+from rate_limit import get_extraction_flights
+from llm_metrics import get_llm_metrics
+from text_chunker import chunk_text
+from json_stream import is_partial
+
+# How long a coalesced caller waits for the in-flight extraction it joined
+COALESCE_TIMEOUT = float(os.getenv("LLM_COALESCE_TIMEOUT", "120"))
 
 def extract_deadlines_with_llm(text: str) -> List[Dict]:
     """
@@ -15,20 +25,201 @@ def extract_deadlines_with_llm(text: str) -> List[Dict]:
     1. Groq (if API key configured)
     2. Ollama (if running locally)
     3. Regex (always available)
+    
+    Texts without any deadline signal are dropped by the local pre-filter
+    before a provider is even selected. LLM results are served from the
+    persistent extraction cache when the same text has already been
+    processed by the same provider and model. Texts longer than one prompt
+    are split into chunks that are extracted in parallel and merged. With
+    LLM_HEDGE_ENABLED, a second provider is raced against a primary that is
+    running slower than its usual tail latency.
     """
-    provider = get_llm_provider()
+    if not get_prefilter().should_extract(text):
+        return []
     
+    registry = get_provider_registry()
+    provider_name = os.getenv("LLM_PROVIDER", "auto")
     try:
-        deadlines = provider.extract_deadlines(text)
-        print(f"Extracted {len(deadlines)} deadlines using {provider.name} provider")
+        # A misconfigured forced provider (e.g. groq without a key) falls back to regex
+        provider = get_llm_provider()
+        provider_name = provider.name
+        
+        # Regex is cheap enough that caching or coalescing it would only add overhead
+        if provider.name == "regex":
+            return provider.extract_deadlines(text)
+        
+        cache = get_extraction_cache()
+        model = getattr(provider, "model", provider.name)
+        cache_key = make_cache_key(text, provider.name, model, EXTRACTION_PROMPT_VERSION)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"Extraction cache hit ({len(cached)} deadlines, {provider.name} provider)")
+            return cached
+        
+        # Identical texts extracted concurrently (e.g. scheduled ingest and a
+        # manual /sync) share one upstream call
+        flights = get_extraction_flights()
+        leader, flight = flights.claim(cache_key)
+        if not leader:
+            return flight.wait(COALESCE_TIMEOUT)
+        # Long texts go through the chunked path; hedging applies to single requests
+        chunked = len(chunk_text(text)) > 1
+        secondary = registry.select_hedge(provider.name) if LLM_HEDGE_ENABLED and not chunked else None
+        winner = provider
+        try:
+            if chunked:
+                deadlines = extract_deadlines_many(provider, [text])[0]
+                if deadlines is None:
+                    raise RuntimeError(f"{provider.name} failed on part of a chunked message")
+            elif secondary is not None:
+                deadlines, winner, hedged = hedged_extract(provider, secondary, text)
+                get_llm_metrics().record_hedge(hedged, winner.name)
+            else:
+                deadlines = provider.extract_deadlines(text)
+        except Exception as e:
+            flights.fail(cache_key, e)
+            registry.record_failure(provider.name)
+            raise
+        registry.record_success(winner.name)
+        # Output cut off by max_tokens is used but not cached, so a later pass can get all of it
+        if not is_partial(deadlines):
+            # A hedge win is the secondary's answer; keep it under its own provider/model
+            winner_model = getattr(winner, "model", winner.name)
+            winner_key = cache_key if winner is provider else make_cache_key(
+                text, winner.name, winner_model, EXTRACTION_PROMPT_VERSION)
+            cache.put(winner_key, winner.name, winner_model, deadlines)
+        flights.resolve(cache_key, deadlines)
+        print(f"Extracted {len(deadlines)} deadlines using {winner.name} provider")
         return deadlines
     except Exception as e:
-        print(f"Deadline extraction failed with {provider.name}: {e}")
+        print(f"Deadline extraction failed with {provider_name}: {e}")
         # If primary provider fails, try regex fallback
+        get_llm_metrics().record_fallback(provider_name, "regex")
         from llm_provider import RegexProvider
         fallback = RegexProvider()
         return fallback.extract_deadlines(text)
 
+def _regex_is_final() -> bool:
+    """True when regex is the configured extractor rather than a stand-in for a failing LLM"""
+    preference = os.getenv("LLM_PROVIDER", "auto")
+    return preference == "regex" or (preference == "auto" and not get_provider_registry().llm_configured())
+
+def _report_resolved(resolved: Optional[List[bool]], texts: List[str], fell_back: set) -> None:
+    if resolved is not None:
+        resolved[:] = [index not in fell_back for index in range(len(texts))]
+
+def extract_deadlines_batch_with_llm(texts: List[str], resolved: Optional[List[bool]] = None) -> List[List[Dict]]:
+    """
+    Extract deadlines from many texts, returning one list per input text
+    
+    Cached texts are answered locally; the rest go to the provider's
+    batched API so N messages cost a handful of requests instead of N,
+    and those requests run concurrently (see llm_async).
+    
+    If `resolved` is given it is filled with one flag per text: False
+    when the text fell back to regex because the LLM was unavailable,
+    rate-limited or failing, True otherwise (pre-filtered, cached,
+    extracted by the provider, or regex by configuration). Callers record
+    only resolved texts as processed, so the rest are retried.
+    """
+    if not texts:
+        return []
+    
+    prefilter = get_prefilter()
+    results: List[Optional[List[Dict]]] = [None] * len(texts)
+    fell_back = set()
+    candidates = []
+    for index, text in enumerate(texts):
+        if prefilter.should_extract(text):
+            candidates.append(index)
+        else:
+            results[index] = []
+    if not candidates:
+        _report_resolved(resolved, texts, fell_back)
+        return results
+    
+    registry = get_provider_registry()
+    try:
+        provider = get_llm_provider()
+    except Exception as e:
+        # A misconfigured forced provider degrades to regex instead of failing ingest
+        print(f"LLM provider unavailable ({e}); using regex provider")
+        get_llm_metrics().record_fallback(os.getenv("LLM_PROVIDER", "auto"), "regex")
+        from llm_provider import RegexProvider
+        provider = RegexProvider()
+        fell_back.update(candidates)
+    
+    if provider.name == "regex":
+        extracted = provider.extract_deadlines_batch([texts[i] for i in candidates])
+        for index, deadlines in zip(candidates, extracted):
+            results[index] = deadlines
+        if not _regex_is_final():
+            fell_back.update(candidates)
+        print(f"Extracted deadlines from {len(texts)} texts using regex provider "
+              f"({len(texts) - len(candidates)} pre-filtered)")
+        _report_resolved(resolved, texts, fell_back)
+        return results
+    
+    cache = get_extraction_cache()
+    flights = get_extraction_flights()
+    model = getattr(provider, "model", provider.name)
+    
+    keys: Dict[int, str] = {}
+    leaders: List[int] = []
+    followers = []
+    for index in candidates:
+        keys[index] = make_cache_key(texts[index], provider.name, model, EXTRACTION_PROMPT_VERSION)
+        cached = cache.get(keys[index])
+        if cached is not None:
+            results[index] = cached
+            continue
+        # Texts already being extracted elsewhere (or earlier in this call)
+        # are awaited instead of being sent upstream again
+        leader, flight = flights.claim(keys[index])
+        if leader:
+            leaders.append(index)
+        else:
+            followers.append((index, flight))
+    
+    if leaders:
+        try:
+            # Packed batches run concurrently on the shared async loop
+            extracted = extract_deadlines_many(provider, [texts[i] for i in leaders])
+            registry.record_success(provider.name)
+            for index, deadlines in zip(leaders, extracted):
+                if deadlines is None:
+                    # Only this text's request failed; it falls back below
+                    flights.fail(keys[index], RuntimeError(f"{provider.name} extraction failed"))
+                    continue
+                results[index] = deadlines
+                if not is_partial(deadlines):
+                    cache.put(keys[index], provider.name, model, deadlines)
+                flights.resolve(keys[index], deadlines)
+        except Exception as e:
+            print(f"Batch deadline extraction failed with {provider.name}: {e}")
+            registry.record_failure(provider.name)
+            for index in leaders:
+                flights.fail(keys[index], e)
+    
+    from llm_provider import RegexProvider
+    fallback = RegexProvider()
+    for index, flight in followers:
+        try:
+            results[index] = flight.wait(COALESCE_TIMEOUT)
+        except Exception:
+            pass
+    for index in candidates:
+        if results[index] is None:
+            get_llm_metrics().record_fallback(provider.name, "regex")
+            results[index] = fallback.extract_deadlines(texts[index])
+            fell_back.add(index)
+    
+    print(f"Extracted deadlines from {len(texts)} texts using {provider.name} provider "
+          f"({len(texts) - len(candidates)} pre-filtered, {len(followers)} coalesced, "
+          f"{len(candidates) - len(leaders) - len(followers)} cached, {len(fell_back)} regex fallback)")
+    _report_resolved(resolved, texts, fell_back)
+    return results
+
 def check_llm_availability() -> Dict:
     """
     Check availability of all LLM providers
@@ -36,6 +227,24 @@ def check_llm_availability() -> Dict:
     """
     return check_all_providers()
 
+def get_extraction_cache_stats() -> Dict:
+    """Hit/miss counters for the persistent extraction cache"""
+    return get_extraction_cache().stats()
+
+def get_prefilter_stats() -> Dict:
+    """How many LLM calls the pre-filter has saved"""
+    return get_prefilter().stats()
+
+def get_replay_stats() -> Dict:
+    """Hit/miss and failure-injection counters of the replay provider"""
+    if os.getenv("LLM_PROVIDER", "auto") != "replay":
+        return {"enabled": False}
+    return {"enabled": True, **get_provider_registry().get("replay").stats()}
+
+def get_llm_metrics_snapshot() -> Dict:
+    """Latency, token, fallback, parse-failure and hedging metrics for all providers"""
+    return get_llm_metrics().snapshot()
+
 # Legacy function names for backward compatibility
 def extract_deadlines_regex_fallback(text: str) -> List[Dict]:
     """Legacy function - use RegexProvider directly"""
@@ -0,0 +1,192 @@
+"""
+In-process instrumentation for LLM calls
+
+Records per-provider, per-operation latency histograms, token usage,
+errors, fallback events and JSON-parse failures. The same collector backs
+the /llm/metrics endpoint and can be inspected (and reset) directly in
+tests. Components other than LLM providers (gmail, dateparser) use the same
+track() helper so a slow ingest cycle can be attributed.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Upper bounds in milliseconds; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+RECENT_SAMPLES = 500
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+class OperationStats:
+    """Counters and latency distribution for one (provider, operation)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def observe(self, elapsed_ms: float, error: bool) -> None:
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent.append(elapsed_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-100) over the most recent samples"""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else None,
+            "p50_ms": _round(self.percentile(50)),
+            "p95_ms": _round(self.percentile(95)),
+            "max_ms": round(self.max_ms, 1),
+            "histogram_ms": dict(zip(labels, self.buckets)),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class LLMMetrics:
+    """Thread-safe collector for all instrumented calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[Tuple[str, str], OperationStats] = {}
+        self._fallbacks: Dict[Tuple[str, str], int] = {}
+        self._parse_failures: Dict[str, int] = {}
+        self._hedge = {"requests": 0, "hedged": 0, "wins": {}}
+
+    def _stats(self, provider: str, operation: str) -> OperationStats:
+        stats = self._ops.get((provider, operation))
+        if stats is None:
+            stats = self._ops[(provider, operation)] = OperationStats()
+        return stats
+
+    def observe(self, provider: str, operation: str, elapsed_ms: float, error: bool = False) -> None:
+        with self._lock:
+            self._stats(provider, operation).observe(elapsed_ms, error)
+
+    def add_tokens(self, provider: str, operation: str, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            stats = self._stats(provider, operation)
+            stats.prompt_tokens += prompt_tokens or 0
+            stats.completion_tokens += completion_tokens or 0
+
+    def record_fallback(self, from_provider: str, to_provider: str) -> None:
+        with self._lock:
+            key = (from_provider, to_provider)
+            self._fallbacks[key] = self._fallbacks.get(key, 0) + 1
+
+    def record_parse_failure(self, provider: str) -> None:
+        with self._lock:
+            self._parse_failures[provider] = self._parse_failures.get(provider, 0) + 1
+
+    def record_hedge(self, hedged: bool, winner: str) -> None:
+        """Count one hedged-mode extraction and which provider answered"""
+        with self._lock:
+            self._hedge["requests"] += 1
+            if hedged:
+                self._hedge["hedged"] += 1
+                self._hedge["wins"][winner] = self._hedge["wins"].get(winner, 0) + 1
+
+    def percentile(self, provider: str, operation: str, q: float) -> Optional[float]:
+        with self._lock:
+            stats = self._ops.get((provider, operation))
+            return stats.percentile(q) if stats else None
+
+    def snapshot(self) -> Dict:
+        """All metrics as plain dicts, grouped by provider then operation"""
+        with self._lock:
+            providers: Dict[str, Dict] = {}
+            for (provider, operation), stats in sorted(self._ops.items()):
+                providers.setdefault(provider, {})[operation] = stats.to_dict()
+            return {
+                "providers": providers,
+                "fallbacks": [
+                    {"from": src, "to": dst, "count": count}
+                    for (src, dst), count in sorted(self._fallbacks.items())
+                ],
+                "json_parse_failures": dict(self._parse_failures),
+                "hedging": {
+                    "requests": self._hedge["requests"],
+                    "hedged": self._hedge["hedged"],
+                    "hedge_rate": round(self._hedge["hedged"] / self._hedge["requests"], 3) if self._hedge["requests"] else 0.0,
+                    "wins": dict(self._hedge["wins"]),
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+            self._fallbacks.clear()
+            self._parse_failures.clear()
+            self._hedge = {"requests": 0, "hedged": 0, "wins": {}}
+
+
+_metrics = LLMMetrics()
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Return the process-wide metrics collector"""
+    return _metrics
+
+
+def usage_from_response(response) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) from a Groq or Ollama response"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    try:
+        return response["prompt_eval_count"] or 0, response["eval_count"] or 0
+    except (KeyError, TypeError):
+        return 0, 0
+
+
+@contextmanager
+def track(provider: str, operation: str):
+    """Time the enclosed block and record it, flagging exceptions as errors"""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except asyncio.CancelledError:
+        # Cancelled calls (e.g. hedging losers) would only skew the latency stats
+        started = None
+        raise
+    except GeneratorExit:
+        # A stream closed early by its consumer (e.g. a client disconnect) is not an error
+        raise
+    except BaseException:
+        error = True
+        raise
+    finally:
+        if started is not None:
+            _metrics.observe(provider, operation, (time.perf_counter() - started) * 1000, error)
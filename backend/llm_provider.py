@@ -3,16 +3,24 @@ LLM Provider Abstraction Layer
 Supports multiple LLM providers: Groq, Ollama, and Regex fallback
 """
 
+import asyncio
 import os
 import json
-import re
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
 
+from regex_engine import default_engine
+from rate_limit import get_rate_limiter, call_with_backoff, acall_with_backoff
+from llm_metrics import get_llm_metrics, track, usage_from_response
+from json_stream import PartialDeadlines, parse_deadlines, parse_grouped_deadlines
+from text_chunker import CHUNK_MAX_CHARS
+
 # Try importing optional dependencies
 try:
-    from groq import Groq
+    from groq import Groq, AsyncGroq
     GROQ_AVAILABLE = True
 except ImportError:
     GROQ_AVAILABLE = False
@@ -26,6 +34,98 @@ except ImportError:
     print("Info: ollama package not installed. Ollama provider unavailable.")
 
 
+# Bump whenever the extraction prompt changes so cached results are not reused
+EXTRACTION_PROMPT_VERSION = "1"
+
+
+def build_extraction_prompt(text: str) -> str:
+    """Prompt shared by the LLM providers for single-message extraction"""
+    return f"""Extract all deadlines and due dates from the following text. 
+Return ONLY a valid JSON array of objects with this exact format:
+[{{"task": "description", "date": "YYYY-MM-DD", "time": "HH:MM or null"}}]
+
+If you find no deadlines, return an empty array: []
+
+Text to analyze:
+{text[:CHUNK_MAX_CHARS]}
+
+JSON output:"""
+
+
+# Rough prompt budget for one batched extraction request
+BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "3000"))
+BATCH_MAX_MESSAGES = int(os.getenv("LLM_BATCH_MAX_MESSAGES", "20"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def build_batch_extraction_prompt(items: List[Tuple[str, str]]) -> str:
+    """Prompt that extracts deadlines from several (id, text) messages at once"""
+    messages = "\n\n".join(f"### MESSAGE {msg_id}\n{text[:CHUNK_MAX_CHARS]}" for msg_id, text in items)
+    return f"""Extract all deadlines and due dates from each of the messages below.
+Return ONLY a valid JSON object that maps every message id to an array of deadlines, using this exact format:
+{{"<message id>": [{{"task": "description", "date": "YYYY-MM-DD", "time": "HH:MM or null"}}]}}
+
+Include every message id. Use an empty array for messages without deadlines.
+
+{messages}
+
+JSON output:"""
+
+
+def pack_batches(texts: List[str], token_budget: int = None, max_messages: int = None) -> List[List[int]]:
+    """Group text indexes into batches that fit the prompt token budget"""
+    token_budget = token_budget or BATCH_TOKEN_BUDGET
+    max_messages = max_messages or BATCH_MAX_MESSAGES
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, text in enumerate(texts):
+        cost = estimate_tokens(text[:CHUNK_MAX_CHARS]) + 8
+        if current and (used + cost > token_budget or len(current) >= max_messages):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_deadline_array(response_text: str, provider: str = "unknown") -> List[Dict]:
+    """
+    Pull the deadlines out of a model response
+    
+    Uses the incremental parser, so chatter around the JSON is ignored and
+    the complete objects of a truncated array are still returned, as
+    PartialDeadlines. Raises ValueError when the response holds no JSON
+    array at all, so callers fall back to regex extraction.
+    """
+    deadlines, parser = parse_deadlines(response_text)
+    if not parser.ok:
+        get_llm_metrics().record_parse_failure(provider)
+    if not parser.found_root:
+        raise ValueError(f"No JSON array in {provider} response")
+    if parser.truncated:
+        print(f"{provider} response was cut off; keeping {len(deadlines)} complete deadlines uncached")
+        return PartialDeadlines(deadlines)
+    return deadlines
+
+
+def parse_batch_response(response_text: str, ids: List[str], provider: str = "unknown") -> Optional[Dict[str, List[Dict]]]:
+    """Map message ids to deadline lists, or None if the output is malformed"""
+    grouped, parser = parse_grouped_deadlines(response_text)
+    if not parser.ok:
+        get_llm_metrics().record_parse_failure(provider)
+    if not grouped:
+        return None
+    # Ids whose arrays were cut off by max_tokens are left out and retried
+    return {msg_id: grouped[msg_id] for msg_id in ids if msg_id in grouped}
+
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
@@ -42,66 +142,211 @@ class LLMProvider(ABC):
         """Answer questions about deadlines"""
         pass
     
+    def chat_stream(self, question: str, context: str) -> Iterator[str]:
+        """Yield the answer in chunks; providers without streaming send one chunk"""
+        yield self.chat(question, context)
+    
     @abstractmethod
     def is_available(self) -> bool:
         """Check if provider is available and working"""
         pass
+    
+    def _upstream(self, operation: str, fn, prompt: str, max_tokens: int):
+        """
+        Run a blocking upstream call under the provider's rate limiter with
+        429 backoff, recording latency and token usage in llm_metrics
+        """
+        with track(self.name, operation):
+            response = call_with_backoff(fn, get_rate_limiter(self.name), estimate_tokens(prompt) + max_tokens)
+        get_llm_metrics().add_tokens(self.name, operation, *usage_from_response(response))
+        return response
+    
+    def _upstream_stream(self, operation: str, fn, prompt: str, max_tokens: int) -> Iterator:
+        """
+        Streaming variant of _upstream(): yields the upstream chunks and keeps
+        the call timed until the stream is exhausted, so latency covers the
+        whole response and mid-stream errors are counted
+        """
+        with track(self.name, operation):
+            yield from call_with_backoff(fn, get_rate_limiter(self.name), estimate_tokens(prompt) + max_tokens)
+    
+    async def _aupstream(self, operation: str, coro_fn, prompt: str, max_tokens: int):
+        """Async variant of _upstream(); coro_fn returns a fresh coroutine per attempt"""
+        with track(self.name, operation):
+            response = await acall_with_backoff(coro_fn, get_rate_limiter(self.name), estimate_tokens(prompt) + max_tokens)
+        get_llm_metrics().add_tokens(self.name, operation, *usage_from_response(response))
+        return response
+    
+    # Providers that implement _complete_extraction() can pack several
+    # messages into one request
+    supports_batching = False
+    
+    def _complete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """
+        Run an extraction prompt and return the raw completion text
+        
+        Only called when supports_batching is set; batching providers must
+        override it.
+        """
+        raise NotImplementedError(f"{self.name} provider does not support batched extraction")
+    
+    def extract_deadlines_batch(self, texts: List[str]) -> List[Optional[List[Dict]]]:
+        """
+        Extract deadlines from several texts, returning one list per text
+        
+        Batching providers pack messages into as few requests as the token
+        budget allows. Messages missing from (or malformed in) a batched
+        response are retried one at a time with extract_deadlines(); a
+        message whose retry fails gets None.
+        """
+        if not self.supports_batching or len(texts) <= 1:
+            return [self.extract_deadlines(text) for text in texts]
+        
+        results: List[Optional[List[Dict]]] = [None] * len(texts)
+        for batch in pack_batches(texts):
+            for index, deadlines in zip(batch, self.extract_batch_group([texts[i] for i in batch])):
+                results[index] = deadlines
+        return results
+    
+    def _batch_request(self, texts: List[str]) -> Tuple[List[str], str, int]:
+        """Message ids, prompt and completion budget for one packed batch"""
+        ids = [str(n + 1) for n in range(len(texts))]
+        prompt = build_batch_extraction_prompt(list(zip(ids, texts)))
+        return ids, prompt, min(4000, 150 * len(texts) + 100)
+    
+    def _unpack_batch(self, response_text: str, ids: List[str]) -> List[Optional[List[Dict]]]:
+        """Per-message results of a batch, with None for ids the model dropped"""
+        parsed = parse_batch_response(response_text, ids, self.name) or {}
+        results = [parsed.get(msg_id) for msg_id in ids]
+        missing = results.count(None)
+        if missing:
+            print(f"{self.name} batch response missing {missing}/{len(ids)} messages; retrying individually")
+        return results
+    
+    def _extract_item(self, text: str) -> Optional[List[Dict]]:
+        """One per-item extraction inside a group; None on failure so the rest of the group survives"""
+        try:
+            return self.extract_deadlines(text)
+        except Exception as e:
+            print(f"{self.name} per-message extraction failed: {e}")
+            return None
+    
+    def extract_batch_group(self, texts: List[str]) -> List[Optional[List[Dict]]]:
+        """
+        Run one packed batch request (see pack_batches)
+        
+        A failed batch request raises; a failed per-message retry only
+        leaves None for that message.
+        """
+        if len(texts) == 1:
+            return [self.extract_deadlines(texts[0])]
+        if not self.supports_batching:
+            return [self._extract_item(text) for text in texts]
+        ids, prompt, max_tokens = self._batch_request(texts)
+        results = self._unpack_batch(self._complete_extraction(prompt, max_tokens, "extract_batch"), ids)
+        return [r if r is not None else self._extract_item(text) for r, text in zip(results, texts)]
+    
+    # Async API. The default implementations run the blocking calls in a
+    # worker thread; Groq and Ollama override them with native async clients.
+    
+    async def _acomplete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Async variant of _complete_extraction()"""
+        return await asyncio.to_thread(self._complete_extraction, prompt, max_tokens, operation)
+    
+    async def aextract_deadlines(self, text: str) -> List[Dict]:
+        """Async variant of extract_deadlines()"""
+        return await asyncio.to_thread(self.extract_deadlines, text)
+    
+    async def _aextract_item(self, text: str) -> Optional[List[Dict]]:
+        """Async variant of _extract_item()"""
+        try:
+            return await self.aextract_deadlines(text)
+        except Exception as e:
+            print(f"{self.name} per-message extraction failed: {e}")
+            return None
+    
+    async def aextract_batch_group(self, texts: List[str]) -> List[Optional[List[Dict]]]:
+        """Async variant of extract_batch_group()"""
+        if len(texts) == 1:
+            return [await self.aextract_deadlines(texts[0])]
+        if not self.supports_batching:
+            return [await self._aextract_item(text) for text in texts]
+        ids, prompt, max_tokens = self._batch_request(texts)
+        results = self._unpack_batch(await self._acomplete_extraction(prompt, max_tokens, "extract_batch"), ids)
+        return [r if r is not None else await self._aextract_item(text) for r, text in zip(results, texts)]
 
 
 class GroqProvider(LLMProvider):
     """Groq Cloud API Provider - Fast and free"""
     
+    supports_batching = True
+    
     def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
         super().__init__("groq")
         self.client = Groq(api_key=api_key)
         self.model = model
+        self._api_key = api_key
+        self._async_client = None
+    
+    @property
+    def async_client(self):
+        """Shared AsyncGroq client, created on first use"""
+        if self._async_client is None:
+            self._async_client = AsyncGroq(api_key=self._api_key)
+        return self._async_client
+    
+    def _complete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Run an extraction prompt and return the raw completion text"""
+        response = self._upstream(operation, lambda: self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a deadline extraction assistant. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens
+        ), prompt, max_tokens)
+        return response.choices[0].message.content.strip()
     
     def extract_deadlines(self, text: str) -> List[Dict]:
         """Extract deadlines using Groq API"""
         try:
-            prompt = f"""Extract all deadlines and due dates from the following text. 
-Return ONLY a valid JSON array of objects with this exact format:
-[{{"task": "description", "date": "YYYY-MM-DD", "time": "HH:MM or null"}}]
-
-If you find no deadlines, return an empty array: []
-
-Text to analyze:
-{text[:1000]}
-
-JSON output:"""
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a deadline extraction assistant. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            # Extract JSON from response
-            response_text = response.choices[0].message.content.strip()
-            
-            # Try to find JSON array in response
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                deadlines = json.loads(json_match.group())
-                return deadlines if isinstance(deadlines, list) else []
-            
-            return []
+            prompt = build_extraction_prompt(text)
+            response_text = self._complete_extraction(prompt, max_tokens=500)
+            return parse_deadline_array(response_text, self.name)
             
         except Exception as e:
             print(f"Groq extraction failed: {e}")
             raise  # Re-raise to trigger fallback
     
-    def chat(self, question: str, context: str) -> str:
-        """Answer questions using Groq API"""
+    async def _acomplete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Async variant of _complete_extraction() using AsyncGroq"""
+        response = await self._aupstream(operation, lambda: self.async_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a deadline extraction assistant. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens
+        ), prompt, max_tokens)
+        return response.choices[0].message.content.strip()
+    
+    async def aextract_deadlines(self, text: str) -> List[Dict]:
+        """Extract deadlines using the async Groq client"""
         try:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            current_day = datetime.now().strftime("%A")
-            
-            prompt = f"""You are DeadlineAI, an intelligent assistant specializing in deadline management and productivity.
+            response_text = await self._acomplete_extraction(build_extraction_prompt(text), max_tokens=500)
+            return parse_deadline_array(response_text, self.name)
+        except Exception as e:
+            print(f"Groq extraction failed: {e}")
+            raise
+    
+    def _chat_messages(self, question: str, context: str) -> List[Dict]:
+        """Chat messages for a deadline question"""
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        current_day = datetime.now().strftime("%A")
+        
+        prompt = f"""You are DeadlineAI, an intelligent assistant specializing in deadline management and productivity.
 
 Today is {current_day}, {current_date}.
 
@@ -134,16 +379,22 @@ INSTRUCTIONS:
    - Provide time management tips when relevant
 
 RESPOND NOW:"""
-
-            response = self.client.chat.completions.create(
+        
+        return [
+            {"role": "system", "content": "You are DeadlineAI, a friendly and intelligent deadline management assistant. Be helpful, concise, and proactive."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def chat(self, question: str, context: str) -> str:
+        """Answer questions using Groq API"""
+        try:
+            messages = self._chat_messages(question, context)
+            response = self._upstream("chat", lambda: self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are DeadlineAI, a friendly and intelligent deadline management assistant. Be helpful, concise, and proactive."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=0.4,
                 max_tokens=400
-            )
+            ), messages[-1]["content"], 400)
             
             return response.choices[0].message.content.strip()
             
@@ -151,6 +402,29 @@ RESPOND NOW:"""
             print(f"Groq chat failed: {e}")
             raise
     
+    def chat_stream(self, question: str, context: str) -> Iterator[str]:
+        """Stream the answer token by token from Groq"""
+        try:
+            messages = self._chat_messages(question, context)
+            stream = self._upstream_stream("chat_stream", lambda: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.4,
+                max_tokens=400,
+                stream=True
+            ), messages[-1]["content"], 400)
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+                # Groq reports usage on the final chunk under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                if getattr(x_groq, "usage", None) is not None:
+                    get_llm_metrics().add_tokens(self.name, "chat_stream", *usage_from_response(x_groq))
+        except Exception as e:
+            print(f"Groq chat stream failed: {e}")
+            raise
+    
     def is_available(self) -> bool:
         """Check if Groq is available"""
         if not GROQ_AVAILABLE:
@@ -170,54 +444,124 @@ RESPOND NOW:"""
 class OllamaProvider(LLMProvider):
     """Ollama Local Provider - Privacy-focused local models"""
     
-    def __init__(self, model: str = "llama3.2:1b"):
+    supports_batching = True
+    
+    def __init__(self, model: str = "llama3.2:1b", host: Optional[str] = None, keep_alive: Optional[str] = None):
         super().__init__("ollama")
         self.model = model
+        self.host = host
+        # How long the server keeps the model loaded after each request
+        # ("30m", or seconds as a number; -1 keeps it loaded indefinitely)
+        keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        try:
+            keep_alive = float(keep_alive)
+        except ValueError:
+            pass
+        self.keep_alive = keep_alive
+        self._client = None
+        self._async_client = None
+        self.warmup: Dict = {"status": "not_run"}
+    
+    @property
+    def client(self):
+        """Persistent ollama.Client, created on first use"""
+        if self._client is None:
+            self._client = ollama.Client(host=self.host)
+        return self._client
+    
+    @property
+    def async_client(self):
+        """Shared ollama.AsyncClient, created on first use"""
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient(host=self.host)
+        return self._async_client
+    
+    def warm_up(self) -> Dict:
+        """
+        Load the model into memory and measure cold vs warm start
+        
+        An empty prompt makes Ollama load the model without generating, so
+        the first call shows the load cost and the second the cost once the
+        model is resident (held for keep_alive).
+        """
+        def load_once() -> Tuple[float, float]:
+            started = time.perf_counter()
+            with track(self.name, "warmup"):
+                response = self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+            # load_duration is reported in nanoseconds
+            return (time.perf_counter() - started) * 1000, (response["load_duration"] or 0) / 1e6
+        
+        try:
+            cold_ms, load_ms = load_once()
+            warm_ms, _ = load_once()
+        except Exception as e:
+            print(f"Ollama warm-up failed: {e}")
+            self.warmup = {"status": "failed", "model": self.model, "reason": str(e)}
+            return self.warmup
+        
+        self.warmup = {
+            "status": "warm",
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "cold_start_ms": round(cold_ms, 1),
+            "model_load_ms": round(load_ms, 1),
+            "warm_start_ms": round(warm_ms, 1),
+            "warmed_at": datetime.now().isoformat(),
+        }
+        print(f"Ollama model {self.model} warmed up (cold {cold_ms:.0f} ms, warm {warm_ms:.0f} ms)")
+        return self.warmup
+    
+    def _complete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Run an extraction prompt and return the raw completion text"""
+        response = self._upstream(operation, lambda: self.client.generate(
+            model=self.model,
+            keep_alive=self.keep_alive,
+            prompt=prompt,
+            options={
+                "temperature": 0.1,
+                "num_predict": max_tokens,
+            }
+        ), prompt, max_tokens)
+        return response['response'].strip()
     
     def extract_deadlines(self, text: str) -> List[Dict]:
         """Extract deadlines using Ollama"""
         try:
-            prompt = f"""Extract all deadlines and due dates from the following text. 
-Return ONLY a valid JSON array of objects with this exact format:
-[{{"task": "description", "date": "YYYY-MM-DD", "time": "HH:MM or null"}}]
-
-If you find no deadlines, return an empty array: []
-
-Text to analyze:
-{text[:1000]}
-
-JSON output:"""
-
-            response = ollama.generate(
-                model=self.model,
-                prompt=prompt,
-                options={
-                    "temperature": 0.1,
-                    "num_predict": 500,
-                }
-            )
-            
-            # Extract JSON from response
-            response_text = response['response'].strip()
-            
-            # Try to find JSON array in response
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                deadlines = json.loads(json_match.group())
-                return deadlines if isinstance(deadlines, list) else []
-            
-            return []
+            prompt = build_extraction_prompt(text)
+            response_text = self._complete_extraction(prompt, max_tokens=500)
+            return parse_deadline_array(response_text, self.name)
             
         except Exception as e:
             print(f"Ollama extraction failed: {e}")
             raise
     
-    def chat(self, question: str, context: str) -> str:
-        """Answer questions using Ollama"""
+    async def _acomplete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Async variant of _complete_extraction() using ollama.AsyncClient"""
+        response = await self._aupstream(operation, lambda: self.async_client.generate(
+            model=self.model,
+            keep_alive=self.keep_alive,
+            prompt=prompt,
+            options={
+                "temperature": 0.1,
+                "num_predict": max_tokens,
+            }
+        ), prompt, max_tokens)
+        return response['response'].strip()
+    
+    async def aextract_deadlines(self, text: str) -> List[Dict]:
+        """Extract deadlines using the async Ollama client"""
         try:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            
-            prompt = f"""You are a helpful assistant for deadline management. Today's date is {current_date}.
+            response_text = await self._acomplete_extraction(build_extraction_prompt(text), max_tokens=500)
+            return parse_deadline_array(response_text, self.name)
+        except Exception as e:
+            print(f"Ollama extraction failed: {e}")
+            raise
+    
+    def _chat_prompt(self, question: str, context: str) -> str:
+        """Prompt for a deadline question"""
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        
+        prompt = f"""You are a helpful assistant for deadline management. Today's date is {current_date}.
 
 {context}
 
@@ -227,15 +571,21 @@ Provide a concise, helpful answer. If asking about deadlines this week/month, ca
 If there are no relevant deadlines, say so clearly.
 
 Answer:"""
-
-            response = ollama.generate(
+        return prompt
+    
+    def chat(self, question: str, context: str) -> str:
+        """Answer questions using Ollama"""
+        try:
+            prompt = self._chat_prompt(question, context)
+            response = self._upstream("chat", lambda: self.client.generate(
                 model=self.model,
+                keep_alive=self.keep_alive,
                 prompt=prompt,
                 options={
                     "temperature": 0.3,
                     "num_predict": 200,
                 }
-            )
+            ), prompt, 200)
             
             return response['response'].strip()
             
@@ -243,12 +593,36 @@ Answer:"""
             print(f"Ollama chat failed: {e}")
             raise
     
+    def chat_stream(self, question: str, context: str) -> Iterator[str]:
+        """Stream the answer token by token from Ollama"""
+        try:
+            prompt = self._chat_prompt(question, context)
+            stream = self._upstream_stream("chat_stream", lambda: self.client.generate(
+                model=self.model,
+                keep_alive=self.keep_alive,
+                prompt=prompt,
+                options={
+                    "temperature": 0.3,
+                    "num_predict": 200,
+                },
+                stream=True
+            ), prompt, 200)
+            for chunk in stream:
+                token = chunk['response']
+                if token:
+                    yield token
+                if chunk['done']:
+                    get_llm_metrics().add_tokens(self.name, "chat_stream", *usage_from_response(chunk))
+        except Exception as e:
+            print(f"Ollama chat stream failed: {e}")
+            raise
+    
     def is_available(self) -> bool:
         """Check if Ollama is available"""
         if not OLLAMA_AVAILABLE:
             return False
         try:
-            ollama.list()
+            self.client.list()
             return True
         except:
             return False
@@ -261,32 +635,14 @@ class RegexProvider(LLMProvider):
         super().__init__("regex")
     
     def extract_deadlines(self, text: str) -> List[Dict]:
-        """Extract deadlines using regex patterns"""
-        deadlines = []
-        
-        # Date patterns
-        patterns = [
-            (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),  # 2024-01-15
-            (r'(\d{1,2}/\d{1,2}/\d{4})', '%m/%d/%Y'),  # 01/15/2024
-            (r'(\d{1,2}-\d{1,2}-\d{4})', '%m-%d-%Y'),  # 01-15-2024
-            (r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* (\d{1,2}),? (\d{4})', None),  # January 15, 2024
-        ]
-        
-        for pattern, date_format in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    date_str = ' '.join(str(m) for m in match)
-                else:
-                    date_str = match
-                
-                deadlines.append({
-                    "task": "Extracted from email",
-                    "date": date_str,
-                    "time": None
-                })
-        
-        return deadlines
+        """Extract deadlines with the single-pass regex engine"""
+        with track(self.name, "extract"):
+            return default_engine.extract(text)
+    
+    def extract_deadlines_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """Bulk regex extraction, no batching overhead needed"""
+        with track(self.name, "extract_batch"):
+            return default_engine.extract_many(texts)
     
     def chat(self, question: str, context: str) -> str:
         """Simple keyword-based responses"""
@@ -308,18 +664,9 @@ class RegexProvider(LLMProvider):
         return True
 
 
-def get_llm_provider(provider_preference: str = "auto") -> LLMProvider:
-    """
-    Factory function to get the best available LLM provider
-    
-    Priority (when provider_preference='auto'):
-    1. Groq (if API key configured)
-    2. Ollama (if running locally)
-    3. Regex (always available)
-    """
-    
-    # If specific provider requested
-    if provider_preference == "groq":
+def _build_provider(name: str) -> LLMProvider:
+    """Construct a provider instance from environment configuration"""
+    if name == "groq":
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable not set")
@@ -327,39 +674,243 @@ def get_llm_provider(provider_preference: str = "auto") -> LLMProvider:
             raise ImportError("groq package not installed. Run: pip install groq")
         return GroqProvider(api_key=api_key, model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
     
-    elif provider_preference == "ollama":
+    if name == "ollama":
         if not OLLAMA_AVAILABLE:
             raise ImportError("ollama package not installed. Run: pip install ollama")
         return OllamaProvider(model=os.getenv("OLLAMA_MODEL", "llama3.2:1b"))
     
-    elif provider_preference == "regex":
+    if name == "regex":
         return RegexProvider()
     
-    # Auto mode: try providers in order
-    # 1. Try Groq
-    api_key = os.getenv("GROQ_API_KEY")
-    if api_key and GROQ_AVAILABLE:
-        try:
-            provider = GroqProvider(api_key=api_key, model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
-            if provider.is_available():
-                print("Using Groq provider")
-                return provider
-        except Exception as e:
-            print(f"Groq provider initialization failed: {e}")
+    if name == "replay":
+        # Imported here because replay_provider builds on this module
+        from replay_provider import ReplayProvider
+        return ReplayProvider()
     
-    # 2. Try Ollama
-    if OLLAMA_AVAILABLE:
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+class ProviderHealth:
+    """Cached health result and circuit breaker state for one provider"""
+    
+    def __init__(self):
+        self.available: Optional[bool] = None
+        self.checked_at: float = 0.0
+        self.consecutive_failures: int = 0
+        self.opened_at: Optional[float] = None
+        self.reason: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            "available": bool(self.available),
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            "consecutive_failures": self.consecutive_failures,
+            "circuit_open": self.opened_at is not None,
+        }
+
+
+class ProviderRegistry:
+    """
+    Process-wide registry of LLM providers
+    
+    Keeps one client instance per provider, caches is_available() results
+    for LLM_HEALTH_TTL seconds and opens a circuit breaker after
+    LLM_CIRCUIT_FAILURES consecutive failures. An open circuit skips the
+    provider for LLM_CIRCUIT_COOLDOWN seconds, after which one probe is
+    allowed through (half-open).
+    """
+    
+    FALLBACK_CHAIN = ("groq", "ollama", "regex")
+    
+    def __init__(self, health_ttl: Optional[float] = None, failure_threshold: Optional[int] = None,
+                 cooldown: Optional[float] = None):
+        self.health_ttl = health_ttl if health_ttl is not None else float(os.getenv("LLM_HEALTH_TTL", "300"))
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv("LLM_CIRCUIT_FAILURES", "3"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("LLM_CIRCUIT_COOLDOWN", "120"))
+        self._lock = threading.RLock()
+        self._providers: Dict[str, LLMProvider] = {}
+        self._health: Dict[str, ProviderHealth] = {}
+    
+    def _health_for(self, name: str) -> ProviderHealth:
+        health = self._health.get(name)
+        if health is None:
+            health = self._health[name] = ProviderHealth()
+        return health
+    
+    def get(self, name: str) -> LLMProvider:
+        """Return the cached provider instance, building it on first use"""
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                provider = self._providers[name] = _build_provider(name)
+            return provider
+    
+    def circuit_open(self, name: str) -> bool:
+        """True while the breaker is open and the cooldown has not elapsed"""
+        with self._lock:
+            health = self._health_for(name)
+            if health.opened_at is None:
+                return False
+            return time.monotonic() - health.opened_at < self.cooldown
+    
+    def is_healthy(self, name: str) -> bool:
+        """Cached availability check, probing only when the TTL has expired"""
+        if name == "regex":
+            return True
+        if self.circuit_open(name):
+            return False
+        
+        with self._lock:
+            health = self._health_for(name)
+            now = time.monotonic()
+            fresh = health.available is not None and now - health.checked_at < self.health_ttl
+            # A half-open circuit always needs a fresh probe
+            if fresh and health.opened_at is None:
+                return health.available
+        
         try:
-            provider = OllamaProvider(model=os.getenv("OLLAMA_MODEL", "llama3.2:1b"))
-            if provider.is_available():
-                print("Using Ollama provider")
-                return provider
+            available = self.get(name).is_available()
+            reason = None if available else "Health check failed"
         except Exception as e:
-            print(f"Ollama provider initialization failed: {e}")
+            available = False
+            reason = str(e)
+        
+        with self._lock:
+            health = self._health_for(name)
+            health.available = available
+            health.checked_at = time.monotonic()
+            health.reason = reason
+        if available:
+            self.record_success(name)
+        else:
+            self.record_failure(name)
+        return available
     
-    # 3. Fallback to Regex
-    print("Using Regex fallback provider")
-    return RegexProvider()
+    def record_success(self, name: str) -> None:
+        """Close the circuit after a successful call"""
+        with self._lock:
+            health = self._health_for(name)
+            health.consecutive_failures = 0
+            health.opened_at = None
+            health.available = True
+            health.checked_at = time.monotonic()
+    
+    def record_failure(self, name: str) -> None:
+        """Count a failed call and open the circuit once the threshold is hit"""
+        if name == "regex":
+            return
+        with self._lock:
+            health = self._health_for(name)
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= self.failure_threshold:
+                if health.opened_at is None or not self.circuit_open(name):
+                    print(f"Circuit opened for {name} provider after {health.consecutive_failures} failures")
+                health.opened_at = time.monotonic()
+                health.available = False
+    
+    def _configured(self, name: str) -> bool:
+        """True when the provider's client library (and key) is present"""
+        if name == "groq":
+            return bool(os.getenv("GROQ_API_KEY") and GROQ_AVAILABLE)
+        if name == "ollama":
+            return OLLAMA_AVAILABLE
+        return True
+    
+    def llm_configured(self) -> bool:
+        """True when auto mode has an LLM provider to try before regex"""
+        return any(self._configured(name) for name in self.FALLBACK_CHAIN if name != "regex")
+    
+    def select_hedge(self, primary: str) -> Optional[LLMProvider]:
+        """Another healthy LLM provider to race `primary` against, if any"""
+        if primary not in self.FALLBACK_CHAIN:
+            return None
+        for name in self.FALLBACK_CHAIN:
+            if name in (primary, "regex") or not self._configured(name):
+                continue
+            try:
+                if self.is_healthy(name):
+                    return self.get(name)
+            except Exception as e:
+                print(f"{name.capitalize()} provider initialization failed: {e}")
+                self.record_failure(name)
+        return None
+    
+    def select(self, provider_preference: str = "auto") -> LLMProvider:
+        """Pick a provider, walking the fallback chain in auto mode"""
+        if provider_preference != "auto":
+            return self.get(provider_preference)
+        
+        skipped = None
+        for name in self.FALLBACK_CHAIN:
+            if not self._configured(name):
+                continue
+            try:
+                if self.is_healthy(name):
+                    if skipped:
+                        get_llm_metrics().record_fallback(skipped, name)
+                    return self.get(name)
+            except Exception as e:
+                print(f"{name.capitalize()} provider initialization failed: {e}")
+                self.record_failure(name)
+            skipped = skipped or name
+        
+        if skipped:
+            get_llm_metrics().record_fallback(skipped, "regex")
+        return self.get("regex")
+    
+    def health(self, name: str) -> Dict:
+        """Snapshot of the cached health state for a provider"""
+        with self._lock:
+            return self._health_for(name).to_dict()
+    
+    def reset(self) -> None:
+        """Drop cached instances and health state (e.g. after config changes)"""
+        with self._lock:
+            self._providers.clear()
+            self._health.clear()
+
+
+_registry = ProviderRegistry()
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """Return the process-wide provider registry"""
+    return _registry
+
+
+def get_llm_provider(provider_preference: Optional[str] = None) -> LLMProvider:
+    """
+    Factory function to get the best available LLM provider
+    
+    Priority (when provider_preference='auto'):
+    1. Groq (if API key configured)
+    2. Ollama (if running locally)
+    3. Regex (always available)
+    
+    The preference defaults to the LLM_PROVIDER env var ('auto' if unset);
+    'replay' selects the offline ReplayProvider (see replay_provider).
+    Instances and health results are cached in the process-wide
+    ProviderRegistry, so repeated calls do not re-probe the providers.
+    """
+    return _registry.select(provider_preference or os.getenv("LLM_PROVIDER", "auto"))
+
+
+def warm_up_ollama() -> Dict:
+    """Pre-load the configured Ollama model through the registry's shared client"""
+    if not OLLAMA_AVAILABLE:
+        return {"status": "unavailable", "reason": "Package not installed"}
+    provider = _registry.get("ollama")
+    result = provider.warm_up()
+    if result["status"] == "warm":
+        _registry.record_success("ollama")
+    return result
+
+
+def get_ollama_warmup_status() -> Dict:
+    """Last warm-up result (cold vs warm start latency) without probing"""
+    if not OLLAMA_AVAILABLE:
+        return {"status": "unavailable", "reason": "Package not installed"}
+    return _registry.get("ollama").warmup
 
 
 def check_all_providers() -> Dict:
@@ -370,8 +921,8 @@ def check_all_providers() -> Dict:
     api_key = os.getenv("GROQ_API_KEY")
     if api_key and GROQ_AVAILABLE:
         try:
-            groq = GroqProvider(api_key=api_key)
-            status["groq"] = {"available": groq.is_available(), "model": os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")}
+            _registry.is_healthy("groq")
+            status["groq"] = {"model": os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"), **_registry.health("groq")}
         except:
             status["groq"] = {"available": False, "reason": "Initialization failed"}
     else:
@@ -380,8 +931,8 @@ def check_all_providers() -> Dict:
     # Check Ollama
     if OLLAMA_AVAILABLE:
         try:
-            ollama_provider = OllamaProvider()
-            status["ollama"] = {"available": ollama_provider.is_available(), "model": os.getenv("OLLAMA_MODEL", "llama3.2:1b")}
+            _registry.is_healthy("ollama")
+            status["ollama"] = {"model": os.getenv("OLLAMA_MODEL", "llama3.2:1b"), **_registry.health("ollama")}
         except:
             status["ollama"] = {"available": False, "reason": "Not running"}
     else:
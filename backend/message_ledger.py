@@ -0,0 +1,93 @@
+"""
+Ledger of source messages that have already been through extraction
+
+Polling re-lists the same Gmail messages and WhatsApp chat history every
+cycle. Recording each processed message lets service.py skip it before the
+fetch and the LLM call instead of deduplicating tasks afterwards. Entries
+older than MESSAGE_LEDGER_TTL_DAYS are pruned; by then the messages have
+aged out of the sync window.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Set
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ProcessedMessage
+
+MESSAGE_LEDGER_TTL_DAYS = float(os.getenv("MESSAGE_LEDGER_TTL_DAYS", "30"))
+# SQLite caps bound parameters per statement
+_LOOKUP_CHUNK = 500
+# Rows per ledger INSERT (four parameters each)
+_INSERT_CHUNK = 200
+# Dialects whose INSERT can skip rows that hit the unique lookup index
+_INSERT_IGNORE = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def content_key(text: str) -> str:
+    """Ledger key for messages without a stable id"""
+    return "sha256:" + hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def processed_keys(db: Session, source: str, scope: str, keys: Iterable[str]) -> Set[str]:
+    """The subset of keys already recorded for (source, scope)"""
+    keys = list(dict.fromkeys(keys))
+    seen: Set[str] = set()
+    for start in range(0, len(keys), _LOOKUP_CHUNK):
+        rows = db.query(ProcessedMessage.message_key).filter(
+            ProcessedMessage.source == source,
+            ProcessedMessage.scope == scope,
+            ProcessedMessage.message_key.in_(keys[start:start + _LOOKUP_CHUNK]),
+        ).all()
+        seen.update(row[0] for row in rows)
+    return seen
+
+
+def unprocessed(db: Session, source: str, scope: str, keys: Iterable[str]) -> List[str]:
+    """Keys not yet in the ledger, in their original order"""
+    keys = list(keys)
+    seen = processed_keys(db, source, scope, keys)
+    return [key for key in keys if key not in seen]
+
+
+def mark_processed(db: Session, source: str, scope: str, keys: Iterable[str]) -> None:
+    """
+    Record keys as processed; the caller commits with the extracted tasks
+
+    Keys another sync recorded in the meantime (e.g. a manual /sync
+    overlapping the scheduler) are skipped by the unique lookup index
+    rather than failing the caller's transaction with IntegrityError.
+    """
+    now = datetime.utcnow()
+    rows = [{"source": source, "scope": scope, "message_key": key, "processed_at": now}
+            for key in dict.fromkeys(keys)]
+    if not rows:
+        return
+    insert = _INSERT_IGNORE.get(db.get_bind().dialect.name)
+    if insert is not None:
+        for start in range(0, len(rows), _INSERT_CHUNK):
+            db.execute(insert(ProcessedMessage).values(rows[start:start + _INSERT_CHUNK]).on_conflict_do_nothing())
+        return
+    # Other databases: one savepoint per new key, so a conflict only drops that row
+    seen = processed_keys(db, source, scope, [row["message_key"] for row in rows])
+    for row in rows:
+        if row["message_key"] in seen:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(ProcessedMessage(**row))
+        except IntegrityError:
+            pass
+
+
+def prune_ledger(db: Session, ttl_days: float = None) -> int:
+    """Delete entries older than the TTL; returns how many were removed"""
+    ttl_days = MESSAGE_LEDGER_TTL_DAYS if ttl_days is None else ttl_days
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+    removed = db.query(ProcessedMessage).filter(ProcessedMessage.processed_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return removed
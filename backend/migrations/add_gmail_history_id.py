@@ -0,0 +1,22 @@
+"""Add Gmail incremental sync state to email accounts
+
+This migration adds:
+- gmail_history_id: Gmail historyId reached by the last sync, used to fetch
+  only messages added since then via users().history().list
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'add_gmail_history_id'
+down_revision = 'add_whatsapp_fields'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # NULL means the next sync does a full scan and records the history ID
+    op.add_column('email_accounts', sa.Column('gmail_history_id', sa.String(), nullable=True))
+
+def downgrade():
+    op.drop_column('email_accounts', 'gmail_history_id')
@@ -0,0 +1,21 @@
+"""Add Gmail page cursor to email accounts
+
+This migration adds:
+- gmail_page_cursor: listing page token ("scan:<token>" or "history:<token>")
+  where a sync that ran out of its per-cycle budget resumes
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'add_gmail_page_cursor'
+down_revision = 'add_gmail_history_id'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('email_accounts', sa.Column('gmail_page_cursor', sa.String(), nullable=True))
+
+def downgrade():
+    op.drop_column('email_accounts', 'gmail_page_cursor')
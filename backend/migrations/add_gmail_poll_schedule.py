@@ -0,0 +1,27 @@
+"""Add adaptive Gmail polling schedule to email accounts
+
+This migration adds:
+- poll_interval_minutes: learned polling interval for the account
+- next_sync_at: when the scheduler should sync the account next
+- consecutive_errors: failed syncs in a row, drives exponential backoff
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'add_gmail_poll_schedule'
+down_revision = 'add_gmail_page_cursor'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # NULL schedule means "due now" with the default interval
+    op.add_column('email_accounts', sa.Column('poll_interval_minutes', sa.Float(), nullable=True))
+    op.add_column('email_accounts', sa.Column('next_sync_at', sa.DateTime(), nullable=True))
+    op.add_column('email_accounts', sa.Column('consecutive_errors', sa.Integer(), nullable=True, server_default='0'))
+
+def downgrade():
+    op.drop_column('email_accounts', 'consecutive_errors')
+    op.drop_column('email_accounts', 'next_sync_at')
+    op.drop_column('email_accounts', 'poll_interval_minutes')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -34,3 +34,20 @@ class EmailAccount(Base):
     refresh_token = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     last_sync = Column(DateTime, nullable=True)
+    gmail_history_id = Column(String, nullable=True)  # Gmail historyId reached by the last sync
+    gmail_page_cursor = Column(String, nullable=True)  # "<scan|history>:<pageToken>" to resume an unfinished listing
+    poll_interval_minutes = Column(Float, nullable=True)  # Adaptive polling interval (see gmail_schedule)
+    next_sync_at = Column(DateTime, nullable=True)
+    consecutive_errors = Column(Integer, default=0)
+
+class ProcessedMessage(Base):
+    __tablename__ = "processed_messages"
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False)  # 'gmail' or 'whatsapp'
+    scope = Column(String, nullable=False)  # Gmail account email or WhatsApp chat name
+    message_key = Column(String, nullable=False)  # Gmail message id, WhatsApp data-id or content hash
+    processed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        Index("ix_processed_messages_lookup", "source", "scope", "message_key", unique=True),
+    )
@@ -0,0 +1,236 @@
+"""
+Rate limiting, retry-with-backoff and request coalescing for LLM calls
+
+Everything here is safe to use from APScheduler threads, FastAPI request
+threads and the shared async loop in llm_async at the same time.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Per-provider limits (0 = unlimited). Defaults match Groq's free tier.
+PROVIDER_LIMITS = {
+    "groq": (int(os.getenv("GROQ_RPM", "30")), int(os.getenv("GROQ_TPM", "12000"))),
+    "ollama": (int(os.getenv("OLLAMA_RPM", "0")), int(os.getenv("OLLAMA_TPM", "0"))),
+}
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30.0"))
+
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets
+
+    reserve() takes capacity immediately (the buckets may go negative) and
+    returns how long the caller has to wait, so the same limiter serves
+    blocking callers (acquire) and coroutines (aacquire).
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Take one request and `tokens` tokens; return seconds to wait first"""
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0
+            if self.requests_per_minute:
+                self._requests -= 1
+                if self._requests < 0:
+                    wait = max(wait, -self._requests * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute and tokens:
+                # A single request larger than the whole bucket can never fit; cap it
+                self._tokens -= min(tokens, self.tokens_per_minute)
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens * 60.0 / self.tokens_per_minute)
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until the request may start; returns the time waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """Async variant of acquire()"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider_name: str) -> TokenBucketLimiter:
+    """Return the shared limiter for a provider"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider_name)
+        if limiter is None:
+            rpm, tpm = PROVIDER_LIMITS.get(provider_name, (0, 0))
+            limiter = _limiters[provider_name] = TokenBucketLimiter(rpm, tpm)
+        return limiter
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True for HTTP 429 / rate limit errors from groq, ollama or httpx"""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(exc).__name__ == "RateLimitError" or "429" in str(exc)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Server-suggested delay from a Retry-After header, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: Exception = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when present"""
+    suggested = _retry_after(exc) if exc is not None else None
+    if suggested is not None:
+        return min(LLM_BACKOFF_MAX, suggested) + random.uniform(0, LLM_BACKOFF_BASE)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def call_with_backoff(fn: Callable[[], Any], limiter: TokenBucketLimiter = None, tokens: int = 0,
+                      max_retries: int = None) -> Any:
+    """Run fn under the limiter, retrying rate-limit errors with jittered backoff"""
+    max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(tokens)
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limit_error(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"Rate limited (attempt {attempt + 1}/{max_retries}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+async def acall_with_backoff(coro_fn: Callable[[], Any], limiter: TokenBucketLimiter = None, tokens: int = 0,
+                             max_retries: int = None) -> Any:
+    """Async variant of call_with_backoff(); coro_fn builds a fresh coroutine per attempt"""
+    max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        if limiter:
+            await limiter.aacquire(tokens)
+        try:
+            return await coro_fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limit_error(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"Rate limited (attempt {attempt + 1}/{max_retries}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class _Flight:
+    """One in-progress upstream call that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self, timeout: float = None):
+        if not self.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for coalesced LLM request")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests into one upstream call
+
+    The first caller for a key becomes the leader and must call resolve()
+    or fail(); later callers for the same key get the leader's flight and
+    wait on it instead of calling upstream themselves.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def claim(self, key: str) -> Tuple[bool, _Flight]:
+        """Return (is_leader, flight) for key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return False, flight
+            flight = self._flights[key] = _Flight()
+            return True, flight
+
+    def resolve(self, key: str, result) -> None:
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight:
+            flight.result = result
+            flight.done.set()
+
+    def fail(self, key: str, error: BaseException) -> None:
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight:
+            flight.error = error
+            flight.done.set()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: float = None) -> Any:
+        """Run fn once for all concurrent callers sharing key"""
+        leader, flight = self.claim(key)
+        if not leader:
+            return flight.wait(timeout)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, result)
+        return result
+
+
+_extraction_flights = SingleFlight()
+
+
+def get_extraction_flights() -> SingleFlight:
+    """Process-wide single-flight group for deadline extraction"""
+    return _extraction_flights
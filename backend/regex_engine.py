@@ -0,0 +1,259 @@
+"""
+Single-pass regex deadline extraction
+
+All date forms are compiled into one alternation, so a text is scanned once
+instead of once per pattern. Each match carries its span, overlapping and
+repeated dates are collapsed, and the surrounding sentence is used as the
+task description. Relative phrases ("tomorrow 5pm", "by Friday", "in 3 days")
+are resolved against a reference date.
+"""
+
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+_WEEKDAYS = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+}
+
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+# Short forms like "sat"/"sun"/"wed" are left out: they are ordinary words too often
+_WEEKDAY = r"(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tues?|thu(?:rs?)?|fri)"
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+_DATE_PATTERN = "|".join([
+    r"(?P<iso>\d{4}-\d{1,2}-\d{1,2})",
+    r"(?P<slash>\d{1,2}/\d{1,2}/\d{4})",
+    r"(?P<dash>\d{1,2}-\d{1,2}-\d{4})",
+    rf"(?P<mon>{_MONTH})\s+(?P<mday>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<myear>\d{{4}}))?",
+    rf"(?P<dday>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<dmon>{_MONTH})(?:,?\s+(?P<dyear>\d{{4}}))?",
+    r"(?P<rel>day\s+after\s+tomorrow|tomorrow|tmrw|today|tonight)",
+    r"(?P<eod>end\s+of\s+(?:the\s+)?day|eod)",
+    r"(?P<eow>end\s+of\s+(?:the\s+)?week|eow)",
+    r"(?P<nextweek>next\s+week)",
+    r"in\s+(?P<in_n>\d{1,2})\s+(?P<in_unit>days?|weeks?)",
+    rf"(?:(?P<wmod>next|this|coming)\s+)?(?P<wday>{_WEEKDAY})",
+])
+
+_TIME_PATTERN = (
+    r"(?:\s*,?\s*(?:at|by|before|@)?\s*"
+    r"(?:(?P<h24>[01]?\d|2[0-3]):(?P<m24>[0-5]\d)(?:\s*(?P<ampm24>[ap]\.?m\.?))?"
+    r"|(?P<h12>1[0-2]|0?[1-9])\s*(?P<ampm12>[ap]\.?m\.?)"
+    r"|(?P<noon>noon|midnight)))?"
+)
+
+DEADLINE_RE = re.compile(rf"\b(?:{_DATE_PATTERN}){_TIME_PATTERN}\b", re.IGNORECASE)
+
+_SENTENCE_BREAK_RE = re.compile(r"[.!?\n]+(?:\s|$)")
+_TRAILING_FILLER_RE = re.compile(
+    r"(?:\b(?:is|are|was|due|deadline|on|by|before|until|till|at|for|of|the|from)\b[\s:,-]*)+$",
+    re.IGNORECASE,
+)
+_LEADING_FILLER_RE = re.compile(r"^[\s:,-]*(?:\b(?:at|by|on)\b[\s:,-]*)*", re.IGNORECASE)
+
+MAX_TASK_LENGTH = 100
+DEFAULT_TASK = "Extracted from email"
+
+
+class DeadlineMatch(NamedTuple):
+    """One deadline found in a text"""
+    start: int
+    end: int
+    matched: str
+    date: str
+    time: Optional[str]
+    task: str
+
+    def to_dict(self) -> Dict:
+        return {"task": self.task, "date": self.date, "time": self.time}
+
+
+def _resolve_year(month: int, day: int, year: Optional[str], today: date) -> Optional[date]:
+    """Build a date, assuming the next occurrence when the year is missing"""
+    try:
+        if year:
+            return date(int(year), month, day)
+        candidate = date(today.year, month, day)
+        if candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+    except ValueError:
+        return None
+
+
+def _numeric_date(value: str, sep: str) -> Optional[date]:
+    """m/d/Y (the original default), switching to d/m/Y when the first part can't be a month"""
+    first, second, year = (int(part) for part in value.split(sep))
+    month, day = (second, first) if first > 12 else (first, second)
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _resolve_date(groups: Dict, today: date) -> Optional[date]:
+    if groups["iso"]:
+        try:
+            return datetime.strptime(groups["iso"], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    if groups["slash"]:
+        return _numeric_date(groups["slash"], "/")
+    if groups["dash"]:
+        return _numeric_date(groups["dash"], "-")
+    if groups["mon"]:
+        return _resolve_year(_MONTHS[groups["mon"][:3].lower()], int(groups["mday"]), groups["myear"], today)
+    if groups["dmon"]:
+        return _resolve_year(_MONTHS[groups["dmon"][:3].lower()], int(groups["dday"]), groups["dyear"], today)
+    if groups["rel"]:
+        rel = groups["rel"].lower()
+        if rel.startswith("day"):
+            return today + timedelta(days=2)
+        if rel in ("tomorrow", "tmrw"):
+            return today + timedelta(days=1)
+        return today
+    if groups["eod"]:
+        return today
+    if groups["eow"]:
+        return today + timedelta(days=(4 - today.weekday()) % 7)
+    if groups["nextweek"]:
+        return today + timedelta(days=7 - today.weekday())
+    if groups["in_n"]:
+        n = int(groups["in_n"])
+        return today + timedelta(days=n * 7 if groups["in_unit"].lower().startswith("week") else n)
+    if groups["wday"]:
+        days_ahead = (_WEEKDAYS[groups["wday"][:3].lower()] - today.weekday()) % 7
+        # "next Friday" never means today
+        if groups["wmod"] and groups["wmod"].lower() == "next" and days_ahead == 0:
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+    return None
+
+
+def _resolve_time(groups: Dict) -> Optional[str]:
+    if groups["h24"]:
+        hour, minute = int(groups["h24"]), int(groups["m24"])
+        ampm = (groups["ampm24"] or "").lower()
+    elif groups["h12"]:
+        hour, minute = int(groups["h12"]), 0
+        ampm = groups["ampm12"].lower()
+    elif groups["noon"]:
+        return "12:00" if groups["noon"].lower() == "noon" else "23:59"
+    elif groups["eod"]:
+        return "23:59"
+    elif groups["rel"] and groups["rel"].lower() == "tonight":
+        return "21:00"
+    else:
+        return None
+
+    if ampm.startswith("p") and hour < 12:
+        hour += 12
+    elif ampm.startswith("a") and hour == 12:
+        hour = 0
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _task_phrase(text: str, start: int, end: int) -> str:
+    """The sentence around a match with the date itself and filler words removed"""
+    sentence_start = 0
+    for brk in _SENTENCE_BREAK_RE.finditer(text, 0, start):
+        sentence_start = brk.end()
+    brk = _SENTENCE_BREAK_RE.search(text, end)
+    sentence_end = brk.start() if brk else len(text)
+
+    before = _TRAILING_FILLER_RE.sub("", text[sentence_start:start].strip())
+    after = _LEADING_FILLER_RE.sub("", text[end:sentence_end].strip())
+    phrase = " ".join(f"{before} {after}".split()).strip(" ,:;-")
+    if len(phrase) > MAX_TASK_LENGTH:
+        phrase = phrase[:MAX_TASK_LENGTH].rsplit(" ", 1)[0]
+    return phrase or DEFAULT_TASK
+
+
+class DeadlineRegexEngine:
+    """Precompiled single-pass deadline scanner"""
+
+    def __init__(self, pattern: re.Pattern = DEADLINE_RE):
+        self.pattern = pattern
+
+    def scan(self, text: str, today: Optional[date] = None) -> List[DeadlineMatch]:
+        """All deadlines in text with spans, one per distinct (date, time)"""
+        today = today or date.today()
+        found: List[DeadlineMatch] = []
+        seen = {}
+        for match in self.pattern.finditer(text):
+            groups = match.groupdict()
+            resolved = _resolve_date(groups, today)
+            date_str = resolved.isoformat() if resolved else match.group(0).strip()
+            time_str = _resolve_time(groups)
+
+            key = (date_str, time_str)
+            if key in seen:
+                continue
+            # A date-only mention of a day we already have with a time adds nothing
+            if time_str is None and any(d == date_str for d, _ in seen):
+                continue
+            seen[key] = len(found)
+            found.append(DeadlineMatch(
+                start=match.start(),
+                end=match.end(),
+                matched=match.group(0),
+                date=date_str,
+                time=time_str,
+                task=_task_phrase(text, match.start(), match.end()),
+            ))
+        return found
+
+    def extract(self, text: str, today: Optional[date] = None) -> List[Dict]:
+        """Deadlines in the same shape the LLM providers return"""
+        return [m.to_dict() for m in self.scan(text, today)]
+
+    def extract_many(self, texts: List[str], today: Optional[date] = None) -> List[List[Dict]]:
+        """Bulk path: one result list per text, sharing the reference date"""
+        today = today or date.today()
+        return [self.extract(text, today) for text in texts]
+
+
+default_engine = DeadlineRegexEngine()
+
+
+def benchmark(texts: List[str], rounds: int = 200) -> Dict:
+    """Measure extract_many() throughput in messages per second"""
+    engine = default_engine
+    engine.extract_many(texts)  # warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        engine.extract_many(texts)
+    elapsed = time.perf_counter() - started
+    messages = len(texts) * rounds
+    return {
+        "messages": messages,
+        "seconds": round(elapsed, 4),
+        "messages_per_second": round(messages / elapsed) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    samples = [
+        "Important: Assignment due on January 20, 2024 at 11:59 PM.",
+        "The hackathon registration deadline is 2024-01-25.",
+        "Please submit your project by 15/02/2024.",
+        "Reminder: lab report by Friday",
+        "Can we meet tomorrow 5pm to review the slides?",
+        "ok 👍",
+        "Thanks, see you later!",
+        "Quiz in 3 days, revise chapters 4 and 5. Also pay the fee before 3rd March",
+    ]
+
+    for sample in samples:
+        print(f"{sample!r}\n  -> {json.dumps(default_engine.extract(sample))}")
+
+    print("\nBenchmark:")
+    print(json.dumps(benchmark(samples), indent=2))
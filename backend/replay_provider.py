@@ -0,0 +1,201 @@
+"""
+Record/replay LLM provider for offline ingestion benchmarks
+
+ReplayProvider answers extraction and chat prompts from a JSON file of
+recorded completions keyed by prompt hash, so the Gmail/WhatsApp pipelines
+can be benchmarked and regression-tested without network access. It runs
+the same prompt building, batching, parsing and metrics code as the real
+providers; only the upstream call is replaced.
+
+    LLM_PROVIDER=replay LLM_REPLAY_MODE=record   capture real Groq/Ollama traffic
+    LLM_PROVIDER=replay                          replay it, with synthetic latency
+                                                 and injected failures
+
+Disable the extraction cache (EXTRACTION_CACHE_ENABLED=false) for
+throughput runs, otherwise repeated texts never reach the provider.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from llm_provider import LLMProvider, build_extraction_prompt, parse_deadline_array, get_provider_registry
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_REPLAY_PATH = (BASE_DIR / "llm_replay.json").as_posix()
+
+
+class ReplayInjectedError(RuntimeError):
+    """Synthetic upstream failure; status_code 429 exercises the backoff path"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Injected replay failure (HTTP {status_code})")
+        self.status_code = status_code
+
+
+def prompt_hash(prompt: str) -> str:
+    """Recording key for one prompt"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class ReplayProvider(LLMProvider):
+    """Serves recorded completions (replay mode) or records a real provider's (record mode)"""
+
+    supports_batching = True
+
+    def __init__(self, path: Optional[str] = None, mode: Optional[str] = None, upstream: Optional[str] = None,
+                 latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                 failure_rate: Optional[float] = None, failure_status: Optional[int] = None,
+                 strict: Optional[bool] = None, seed: Optional[int] = None):
+        super().__init__("replay")
+        self.path = path or os.getenv("LLM_REPLAY_PATH", DEFAULT_REPLAY_PATH)
+        self.mode = mode or os.getenv("LLM_REPLAY_MODE", "replay")
+        if self.mode not in ("replay", "record"):
+            raise ValueError(f"Unknown LLM_REPLAY_MODE: {self.mode}")
+        self.upstream_name = upstream or os.getenv("LLM_REPLAY_UPSTREAM", "auto")
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("LLM_REPLAY_LATENCY_MS", "0"))
+        self.jitter_ms = jitter_ms if jitter_ms is not None else float(os.getenv("LLM_REPLAY_JITTER_MS", "0"))
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv("LLM_REPLAY_FAILURE_RATE", "0"))
+        self.failure_status = failure_status or int(os.getenv("LLM_REPLAY_FAILURE_STATUS", "500"))
+        self.strict = strict if strict is not None else os.getenv("LLM_REPLAY_STRICT", "false").lower() == "true"
+        seed = seed if seed is not None else int(os.getenv("LLM_REPLAY_SEED", "0"))
+        # A seeded generator makes latency and failures identical across runs
+        self._random = random.Random(seed)
+        self.model = f"replay:{Path(self.path).name}"
+
+        self._lock = threading.Lock()
+        self._upstream_provider: Optional[LLMProvider] = None
+        self.recordings: Dict[str, Dict] = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.injected_failures = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.recordings, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def upstream(self) -> LLMProvider:
+        """Real provider whose responses are captured in record mode"""
+        if self._upstream_provider is None:
+            provider = get_provider_registry().select(self.upstream_name)
+            if provider.name in ("regex", self.name):
+                raise RuntimeError("Record mode needs a Groq or Ollama provider to record from")
+            self._upstream_provider = provider
+        return self._upstream_provider
+
+    def _delay(self) -> float:
+        """Synthetic latency for one call, in seconds; raises injected failures"""
+        with self._lock:
+            fail = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            if fail:
+                self.injected_failures += 1
+        if fail:
+            raise ReplayInjectedError(self.failure_status)
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def _lookup(self, prompt: str, default: str) -> str:
+        key = prompt_hash(prompt)
+        with self._lock:
+            entry = self.recordings.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry["response"]
+            self.misses += 1
+        if self.strict:
+            raise KeyError(f"No recorded response for prompt {key[:12]}")
+        return default
+
+    def _record(self, prompt: str, operation: str, response: str) -> str:
+        with self._lock:
+            self.recordings[prompt_hash(prompt)] = {"operation": operation, "response": response}
+            self.recorded += 1
+            self._save()
+        return response
+
+    def _respond(self, prompt: str, max_tokens: int, operation: str) -> str:
+        if self.mode == "record":
+            return self._record(prompt, operation, self.upstream._complete_extraction(prompt, max_tokens, operation))
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._lookup(prompt, "[]")
+
+    def _complete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Recorded (or freshly recorded) completion text for an extraction prompt"""
+        return self._upstream(operation, lambda: self._respond(prompt, max_tokens, operation), prompt, max_tokens)
+
+    async def _acomplete_extraction(self, prompt: str, max_tokens: int, operation: str = "extract") -> str:
+        """Async variant that sleeps on the event loop, so concurrency behaves like real I/O"""
+        if self.mode == "record":
+            return await super()._acomplete_extraction(prompt, max_tokens, operation)
+
+        async def respond():
+            delay = self._delay()
+            if delay:
+                await asyncio.sleep(delay)
+            return self._lookup(prompt, "[]")
+
+        return await self._aupstream(operation, respond, prompt, max_tokens)
+
+    def extract_deadlines(self, text: str) -> List[Dict]:
+        """Extract deadlines from the recorded completion for this text's prompt"""
+        response_text = self._complete_extraction(build_extraction_prompt(text), max_tokens=500)
+        return parse_deadline_array(response_text, self.name)
+
+    async def aextract_deadlines(self, text: str) -> List[Dict]:
+        """Async variant of extract_deadlines()"""
+        response_text = await self._acomplete_extraction(build_extraction_prompt(text), max_tokens=500)
+        return parse_deadline_array(response_text, self.name)
+
+    def chat(self, question: str, context: str) -> str:
+        """Recorded answer for (question, context)"""
+        prompt = f"chat\x1f{question}\x1f{context}"
+        if self.mode == "record":
+            return self._record(prompt, "chat", self.upstream.chat(question, context))
+
+        def respond():
+            delay = self._delay()
+            if delay:
+                time.sleep(delay)
+            return self._lookup(prompt, "No recorded answer for this question.")
+
+        return self._upstream("chat", respond, prompt, 200)
+
+    def is_available(self) -> bool:
+        """Replay needs recordings (unless misses are allowed); record needs a real upstream"""
+        if self.mode == "record":
+            try:
+                return self.upstream.is_available()
+            except Exception:
+                return False
+        return bool(self.recordings) or not self.strict
+
+    def stats(self) -> Dict:
+        """Hit/miss and failure-injection counters for a benchmark run"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "recordings": len(self.recordings),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+                "injected_failures": self.injected_failures,
+            }
@@ -1,115 +1,469 @@
 from sqlalchemy.orm import Session
+from database import SessionLocal
 from models import Task, UserPreferences, EmailAccount
 from whatsapp_ingest import fetch_whatsapp_messages
 from notify import send_desktop_notification
 from whatsapp_notify import send_deadline_reminder_whatsapp
 import dateparser
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import os
-from google.oauth2.credentials import Credentials
+import threading
+import time
 from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import base64
 
 # Use LLM provider instead of spacy for deadline extraction
-from llm_deadline_extractor import extract_deadlines_with_llm
+from llm_deadline_extractor import extract_deadlines_batch_with_llm
+from llm_metrics import track
+from message_ledger import unprocessed, mark_processed, content_key
+from gmail_service_cache import get_gmail_service_cache
+from gmail_body import extract_body_text
+from deadline_prefilter import score_text
+import gmail_schedule
 
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# Keyword query for full scans (first sync, or after the history ID expired)
+GMAIL_FULL_SCAN_QUERY = 'newer_than:7d (deadline OR assignment OR meeting OR submit OR register OR project)'
+# Per-cycle budget for one account; the rest is picked up next cycle from the stored page cursor
+GMAIL_SYNC_MAX_MESSAGES = int(os.getenv("GMAIL_SYNC_MAX_MESSAGES", "100"))
+GMAIL_SYNC_TIME_BUDGET = float(os.getenv("GMAIL_SYNC_TIME_BUDGET", "120"))
+GMAIL_PAGE_SIZE = int(os.getenv("GMAIL_PAGE_SIZE", "50"))
+# Full bodies are fetched only for messages whose subject + snippet score at least this
+GMAIL_FETCH_BODIES = os.getenv("GMAIL_FETCH_BODIES", "true").lower() != "false"
+GMAIL_BODY_SCORE_THRESHOLD = float(os.getenv("GMAIL_BODY_SCORE_THRESHOLD", "1.5"))
+# Accounts synced concurrently, and how long one account may take before it is reported as timed out
+GMAIL_SYNC_WORKERS = int(os.getenv("GMAIL_SYNC_WORKERS", "4"))
+GMAIL_ACCOUNT_TIMEOUT = float(os.getenv("GMAIL_ACCOUNT_TIMEOUT", "300"))
+# Messages per batch HTTP request (Gmail allows 100; it recommends 50 or fewer)
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+
+# WhatsApp messages that fell back to regex are sent to the LLM again on this many
+# later scrapes before the regex result is kept
+WHATSAPP_FALLBACK_RETRIES = int(os.getenv("WHATSAPP_FALLBACK_RETRIES", "3"))
+
+# Accounts with a sync queued or running in this process; a worker that outlived
+# GMAIL_ACCOUNT_TIMEOUT stays here until it actually finishes
+_gmail_syncs_in_flight = set()
+_gmail_syncs_lock = threading.Lock()
+
+def _claim_gmail_sync(account_id: int) -> bool:
+    """Reserve an account for one sync; False while its previous sync is unfinished"""
+    with _gmail_syncs_lock:
+        if account_id in _gmail_syncs_in_flight:
+            return False
+        _gmail_syncs_in_flight.add(account_id)
+        return True
+
+def _release_gmail_sync(account_id: int) -> None:
+    with _gmail_syncs_lock:
+        _gmail_syncs_in_flight.discard(account_id)
+
+# Task dedupe reads committed rows, so concurrent syncs (parallel Gmail accounts,
+# scheduler vs /sync) take this lock from the dedupe query until their commit
+_task_insert_lock = threading.Lock()
+
+# (chat, message key) -> scrapes a regex-fallback message has been held back so far
+_whatsapp_deferred = {}
+_whatsapp_deferred_lock = threading.Lock()
+
+def _settle_whatsapp_fallbacks(chat_name: str, keys, resolved) -> set:
+    """
+    Keys whose extraction is final: resolved ones, and fallbacks already
+    retried WHATSAPP_FALLBACK_RETRIES times. The rest get neither tasks nor
+    a ledger entry, so the next scrape sends them to the LLM again.
+    """
+    final = set()
+    with _whatsapp_deferred_lock:
+        # Messages no longer listed (scrolled away or processed) stop being tracked
+        current = set(keys)
+        for chat, key in list(_whatsapp_deferred):
+            if chat == chat_name and key not in current:
+                del _whatsapp_deferred[(chat, key)]
+        for key, ok in zip(keys, resolved):
+            deferred = _whatsapp_deferred.pop((chat_name, key), 0)
+            if ok or deferred >= WHATSAPP_FALLBACK_RETRIES:
+                final.add(key)
+            else:
+                _whatsapp_deferred[(chat_name, key)] = deferred + 1
+    return final
+
 def get_gmail_service(email_account: EmailAccount):
-    """Get authenticated Gmail service using refresh token"""
-    creds = Credentials(
-        None,
-        refresh_token=email_account.refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        scopes=SCOPES
-    )
-    
-    if not creds.valid:
-        creds.refresh(Request())
-        
-    return build('gmail', 'v1', credentials=creds)
+    """Get authenticated Gmail service using refresh token (cached per account)"""
+    return get_gmail_service_cache(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, SCOPES).get(email_account)
+
+def _gmail_profile_history_id(service):
+    with track("gmail", "profile"):
+        return service.users().getProfile(userId='me').execute().get('historyId')
 
-def fetch_gmail_deadlines_oauth(service, email_address: str, category: str = "general"):
-    """Fetch and process emails using Google Gmail API with LLM extraction"""
-    # Expanded query to capture more deadlines (last 7 days)
-    query = 'newer_than:7d (deadline OR assignment OR meeting OR submit OR register OR project)'
-    print(f"DEBUG: Gmail Query: {query}")
-    results = service.users().messages().list(userId='me', q=query).execute()
-    messages = results.get('messages', [])
+def _list_gmail_page(service, kind: str, start_history_id, page_token, max_results: int):
+    """One listing page: (message ids, next page token, historyId reported by the page)"""
+    if kind == "scan":
+        with track("gmail", "list"):
+            results = service.users().messages().list(
+                userId='me', q=GMAIL_FULL_SCAN_QUERY, maxResults=max_results, pageToken=page_token
+            ).execute()
+        return [msg['id'] for msg in results.get('messages', [])], results.get('nextPageToken'), None
     
-    extracted_tasks = []
+    with track("gmail", "history"):
+        results = service.users().history().list(
+            userId='me', startHistoryId=start_history_id, historyTypes=['messageAdded'],
+            labelId='INBOX', maxResults=max_results, pageToken=page_token
+        ).execute()
+    message_ids = []
+    for record in results.get('history', []):
+        for added in record.get('messagesAdded', []):
+            if added['message']['id'] not in message_ids:
+                message_ids.append(added['message']['id'])
+    return message_ids, results.get('nextPageToken'), results.get('historyId')
+
+def iter_gmail_messages(service, sync_state: dict, max_messages: int = None, time_budget: float = None,
+                        skip_processed=None):
+    """
+    Yield metadata for new messages page by page, within a per-cycle budget
+    
+    sync_state holds 'history_id' and 'page_cursor' and is updated in place
+    as pages complete. With a stored historyId only messages added since
+    then are listed (users().history().list); first syncs and expired
+    history IDs run the keyword full scan. When the message or time budget
+    runs out, page_cursor records where the next cycle resumes.
+    
+    skip_processed, if given, maps a page's message ids to the ones still
+    worth fetching (see message_ledger); only those count against the budget.
+    """
+    max_messages = max_messages or GMAIL_SYNC_MAX_MESSAGES
+    deadline = time.monotonic() + (time_budget or GMAIL_SYNC_TIME_BUDGET)
+    remaining = max_messages
+    
+    kind, _, page_token = (sync_state.get('page_cursor') or "").partition(":")
+    page_token = page_token or None
+    if kind not in ("scan", "history"):
+        kind = "history" if sync_state.get('history_id') else "scan"
+        page_token = None
+    if kind == "scan" and page_token is None:
+        # Read the current historyId before scanning so nothing arriving mid-scan is missed later
+        sync_state['history_id'] = _gmail_profile_history_id(service)
+    latest_history_id = None
+    
+    while True:
+        try:
+            message_ids, page_token, page_history_id = _list_gmail_page(
+                service, kind, sync_state.get('history_id'), page_token, min(GMAIL_PAGE_SIZE, remaining)
+            )
+        except HttpError as e:
+            if kind != "history" or e.resp.status != 404:
+                raise
+            print(f"Gmail history ID {sync_state.get('history_id')} expired; running a full scan")
+            kind, page_token = "scan", None
+            sync_state['history_id'] = _gmail_profile_history_id(service)
+            continue
+        latest_history_id = page_history_id or latest_history_id
+        
+        sync_state['listed'] = sync_state.get('listed', 0) + len(message_ids)
+        if skip_processed is not None and message_ids:
+            listed = len(message_ids)
+            message_ids = skip_processed(message_ids)
+            if listed > len(message_ids):
+                print(f"Skipping {listed - len(message_ids)} already processed Gmail messages")
+        
+        for msg_data in fetch_gmail_metadata(service, message_ids):
+            yield msg_data
+        remaining -= len(message_ids)
+        
+        if not page_token:
+            # Listing drained: history moves forward, the cursor is cleared
+            if kind == "history" and latest_history_id:
+                sync_state['history_id'] = latest_history_id
+            sync_state['page_cursor'] = None
+            return
+        sync_state['page_cursor'] = f"{kind}:{page_token}"
+        if remaining <= 0 or time.monotonic() >= deadline:
+            print(f"Gmail sync budget reached after {max_messages - remaining} messages; resuming next cycle")
+            return
+
+def _batch_get_messages(service, message_ids, retries: int = 1, **get_args):
+    """
+    messages().get for many ids via batch HTTP requests
     
-    for msg in messages:
-        msg_data = service.users().messages().get(userId='me', id=msg['id']).execute()
-        headers = msg_data.get('payload', {}).get('headers', [])
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
+    Returns {id: message resource}. Deleted messages (404) are dropped;
+    other per-item failures are retried in a later batch, then skipped.
+    """
+    fetched = {}
+    pending = list(message_ids)
+    for attempt in range(retries + 1):
+        failed = []
         
-        # Get snippet or body
-        snippet = msg_data.get('snippet', "")
+        def on_response(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                pass
+            else:
+                failed.append((request_id, exception))
         
-        # Use LLM for intelligent deadline extraction
-        message_text = f"{subject}\n{snippet}"
-        deadlines = extract_deadlines_with_llm(message_text)
+        for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=on_response)
+            for msg_id in pending[start:start + GMAIL_BATCH_SIZE]:
+                batch.add(service.users().messages().get(userId='me', id=msg_id, **get_args), request_id=msg_id)
+            with track("gmail", "batch_get"):
+                batch.execute()
         
-        # Add each extracted deadline as a task
-        for deadline_info in deadlines:
-            extracted_tasks.append({
-                "summary": deadline_info.get("task", subject),
-                "deadline": f"{deadline_info.get('date', '')} {deadline_info.get('time', '')}".strip(),
-                "account": email_address,
-                "category": category
-            })
+        pending = [msg_id for msg_id, _ in failed]
+        if not pending:
+            break
+        if attempt < retries:
+            print(f"Retrying {len(pending)} Gmail messages that failed in a batch")
+        else:
+            print(f"Skipping {len(pending)} Gmail messages after batch errors: {failed[0][1]}")
+    return fetched
+
+def fetch_gmail_metadata(service, message_ids, retries: int = 1):
+    """Subject header and snippet for many messages, in the order of message_ids"""
+    fetched = _batch_get_messages(service, message_ids, retries, format='metadata', metadataHeaders=['Subject'])
+    return [fetched[msg_id] for msg_id in message_ids if msg_id in fetched]
+
+def fetch_gmail_bodies(service, message_ids, retries: int = 1):
+    """{id: plain-text body} for messages worth a full fetch (see gmail_body)"""
+    fetched = _batch_get_messages(service, message_ids, retries, format='full', fields='id,payload')
+    return {msg_id: extract_body_text(msg.get('payload', {})) for msg_id, msg in fetched.items()}
+
+def _needs_body(text: str) -> bool:
+    """Second tier: only messages that look like they mention a deadline get their body fetched"""
+    if not GMAIL_FETCH_BODIES:
+        return False
+    return score_text(text) >= GMAIL_BODY_SCORE_THRESHOLD
+
+def _with_bodies(service, message_ids, subjects, message_texts):
+    """Swap the snippet for the full body on messages that pass _needs_body()"""
+    wanted = [msg_id for msg_id, text in zip(message_ids, message_texts) if _needs_body(text)]
+    if not wanted:
+        return message_texts
+    bodies = fetch_gmail_bodies(service, wanted)
+    print(f"Fetched full bodies for {len(bodies)}/{len(message_ids)} Gmail messages")
+    return [
+        f"{subject}\n{bodies[msg_id]}" if bodies.get(msg_id) else text
+        for msg_id, subject, text in zip(message_ids, subjects, message_texts)
+    ]
+
+def fetch_gmail_deadlines_oauth(service, email_address: str, category: str = "general", account: EmailAccount = None,
+                                db: Session = None, sync_stats: dict = None):
+    """
+    Fetch and process emails using Google Gmail API with LLM extraction
+    
+    Messages stream in page by page and are extracted in groups on a worker
+    thread while the next pages are fetched. When the EmailAccount is
+    passed, its historyId and page cursor are advanced once everything
+    fetched has been extracted. With a db session, messages already in the
+    processed-message ledger are skipped before they are fetched.
+    sync_stats, if given, receives the number of messages listed and the
+    ids of those extracted, for the caller to record in the ledger
+    alongside the tasks.
+    """
+    sync_state = {
+        'history_id': account.gmail_history_id if account is not None else None,
+        'page_cursor': account.gmail_page_cursor if account is not None else None,
+    }
+    
+    skip_processed = None
+    if db is not None:
+        skip_processed = lambda ids: unprocessed(db, "gmail", email_address, ids)
+    
+    extracted_tasks = []
+    processed_ids = []
+    pending = []
+    message_ids = []
+    subjects = []
+    message_texts = []
+    
+    with ThreadPoolExecutor(max_workers=1) as extractor:
+        for msg_data in iter_gmail_messages(service, sync_state, skip_processed=skip_processed):
+            headers = msg_data.get('payload', {}).get('headers', [])
+            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
+            
+            # Metadata responses carry the snippet; likely deadlines get their body later
+            snippet = msg_data.get('snippet', "")
+            
+            message_ids.append(msg_data['id'])
+            subjects.append(subject)
+            message_texts.append(f"{subject}\n{snippet}")
+            if len(message_texts) >= GMAIL_PAGE_SIZE:
+                # Use LLM for intelligent deadline extraction, several messages per request
+                message_texts = _with_bodies(service, message_ids, subjects, message_texts)
+                pending.append((message_ids, subjects, extractor.submit(extract_deadlines_batch_with_llm, message_texts)))
+                message_ids, subjects, message_texts = [], [], []
+        if message_texts:
+            message_texts = _with_bodies(service, message_ids, subjects, message_texts)
+            pending.append((message_ids, subjects, extractor.submit(extract_deadlines_batch_with_llm, message_texts)))
+        
+        for group_ids, group_subjects, future in pending:
+            group_deadlines = future.result()
+            # Regex fallbacks are final here too: the historyId has moved past them, so
+            # they'd only come back in a full scan, worded differently, as duplicate tasks
+            processed_ids.extend(group_ids)
+            for subject, deadlines in zip(group_subjects, group_deadlines):
+                # Add each extracted deadline as a task
+                for deadline_info in deadlines:
+                    extracted_tasks.append({
+                        "summary": deadline_info.get("task", subject),
+                        "deadline": f"{deadline_info.get('date', '')} {deadline_info.get('time', '')}".strip(),
+                        "account": email_address,
+                        "category": category
+                    })
+    
+    if account is not None:
+        if sync_state['history_id']:
+            account.gmail_history_id = str(sync_state['history_id'])
+        account.gmail_page_cursor = sync_state['page_cursor']
+    if sync_stats is not None:
+        sync_stats['listed'] = sync_state.get('listed', 0)
+        sync_stats['processed'] = processed_ids
             
     return extracted_tasks
 
-def ingest_all_gmail_accounts(db: Session):
-    """Iterate through all active OAuth accounts and fetch deadlines"""
-    accounts = db.query(EmailAccount).filter(EmailAccount.is_active == True).all()
-    total_ingested = []
+def sync_gmail_account(account_id: int, started: dict = None):
+    """
+    Sync one account in its own session; returns the new tasks and timing
     
-    for account in accounts:
-        try:
-            print(f"Syncing Gmail for: {account.email}")
+    Errors are caught and reported in the result so one failing mailbox
+    never affects the others.
+    """
+    if started is not None:
+        started[account_id] = time.monotonic()
+    begin = time.perf_counter()
+    db = SessionLocal()
+    email = None
+    ingested = []
+    try:
+        account = db.query(EmailAccount).filter(EmailAccount.id == account_id).first()
+        if account is None or not account.is_active:
+            return {"email": email, "ingested": [], "seconds": 0.0, "error": None}
+        email = account.email
+        print(f"Syncing Gmail for: {email}")
+        with track("gmail", "account_sync"):
             service = get_gmail_service(account)
-            deadlines = fetch_gmail_deadlines_oauth(service, account.email, account.category)
+            sync_stats = {}
+            deadlines = fetch_gmail_deadlines_oauth(service, account.email, account.category, account, db, sync_stats)
             
-            for d in deadlines:
-                # Deduplication
-                existing = db.query(Task).filter(
-                    Task.summary == d['summary'], 
-                    Task.source == "gmail"
-                ).first()
+            # The same mail in two accounts synced in parallel must not pass both dedupe checks.
+            # Every write of this sync happens here, so no session holds SQLite's write lock
+            # while it waits for ours
+            with _task_insert_lock:
+                mark_processed(db, "gmail", account.email, sync_stats.get('processed', []))
+                added = set()
+                for d in deadlines:
+                    # Deduplication (pending rows aren't flushed, so also against this sync's own)
+                    if d['summary'] in added:
+                        continue
+                    existing = db.query(Task).filter(
+                        Task.summary == d['summary'], 
+                        Task.source == "gmail"
+                    ).first()
+                    
+                    if not existing:
+                        db_task = Task(
+                            summary=d['summary'],
+                            deadline=d['deadline'],
+                            source="gmail",
+                            alert_status="pending"
+                        )
+                        db.add(db_task)
+                        added.add(d['summary'])
+                        ingested.append(d)
                 
-                if not existing:
-                    db_task = Task(
-                        summary=d['summary'],
-                        deadline=d['deadline'],
-                        source="gmail",
-                        alert_status="pending"
-                    )
-                    db.add(db_task)
-                    total_ingested.append(d)
-            
-            account.last_sync = datetime.now()
-            db.commit()
-            
-        except Exception as e:
-            error_msg = f"Failed to sync {account.email}: {str(e)}"
-            print(error_msg)
-            total_ingested.append({"error": error_msg, "email": account.email})
+                account.last_sync = datetime.now()
+                gmail_schedule.record_success(account, sync_stats.get('listed', 0), len(ingested))
+                db.commit()
+        return {"email": email, "ingested": ingested, "seconds": time.perf_counter() - begin, "error": None}
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Failed to sync {email or account_id}: {str(e)}"
+        try:
+            account = db.query(EmailAccount).filter(EmailAccount.id == account_id).first()
+            if account is not None:
+                delay = gmail_schedule.record_error(account)
+                db.commit()
+                error_msg += f" (retrying in {delay:.0f} min)"
+        except Exception as schedule_error:
+            print(f"Could not record sync error for {email or account_id}: {schedule_error}")
+        return {"email": email, "ingested": [], "seconds": time.perf_counter() - begin, "error": error_msg}
+    finally:
+        db.close()
+
+def ingest_all_gmail_accounts(db: Session, due_only: bool = False):
+    """
+    Sync all active OAuth accounts concurrently and fetch deadlines
+    
+    Up to GMAIL_SYNC_WORKERS accounts run at once, each with its own
+    session. An account still running GMAIL_ACCOUNT_TIMEOUT seconds after
+    it started is reported as timed out and no longer waited for. An
+    account whose previous sync (from the scheduler or /sync) is still
+    queued or running, including one that timed out, is skipped rather
+    than synced twice at once. With due_only, accounts whose adaptive
+    schedule (gmail_schedule) hasn't come round yet are skipped.
+    """
+    accounts = db.query(EmailAccount).filter(EmailAccount.is_active == True).all()
+    total_ingested = []
+    
+    # Deactivated or removed accounts lose their cached Gmail clients
+    get_gmail_service_cache(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, SCOPES).retain(a.id for a in accounts)
+    if due_only:
+        accounts = [account for account in accounts if gmail_schedule.is_due(account)]
+    busy = [account for account in accounts if not _claim_gmail_sync(account.id)]
+    if busy:
+        print(f"Skipping Gmail accounts with a sync still running: {[account.email for account in busy]}")
+    accounts = [account for account in accounts if account not in busy]
+    emails = {account.id: account.email for account in accounts}
+    if not accounts:
+        return total_ingested
+    
+    begin = time.perf_counter()
+    started = {}
+    timings = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, GMAIL_SYNC_WORKERS), thread_name_prefix="gmail-sync")
+    futures = {}
+    for account_id in emails:
+        future = pool.submit(sync_gmail_account, account_id, started)
+        # Released when the worker really ends (or is cancelled before starting), not when we stop waiting
+        future.add_done_callback(lambda _, account_id=account_id: _release_gmail_sync(account_id))
+        futures[future] = account_id
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                email = result["email"] or emails[futures[future]]
+                timings[email] = round(result["seconds"], 2)
+                if result["error"]:
+                    print(result["error"])
+                    total_ingested.append({"error": result["error"], "email": email})
+                total_ingested.extend(result["ingested"])
             
+            now = time.monotonic()
+            for future in list(pending):
+                account_id = futures[future]
+                if account_id in started and now - started[account_id] > GMAIL_ACCOUNT_TIMEOUT:
+                    # The worker thread can't be killed; stop waiting and report it
+                    future.cancel()
+                    pending.discard(future)
+                    error_msg = f"Timed out syncing {emails[account_id]} after {GMAIL_ACCOUNT_TIMEOUT:.0f}s"
+                    print(error_msg)
+                    timings[emails[account_id]] = None
+                    total_ingested.append({"error": error_msg, "email": emails[account_id]})
+    finally:
+        pool.shutdown(wait=False)
+    
+    print(f"Gmail sync of {len(emails)} accounts took {time.perf_counter() - begin:.2f}s; per account: {timings}")
     return total_ingested
 
-def ingest_gmail_tasks(db: Session):
+def ingest_gmail_tasks(db: Session, due_only: bool = False):
     """Legacy support for single account in .env, combined with multi-account logic"""
     # 1. First run the new multi-account logic
-    results = ingest_all_gmail_accounts(db)
+    results = ingest_all_gmail_accounts(db, due_only)
     
     # 2. Add fallback for the legacy .env account if it's still configured and not already in EmailAccount
     # (Optional: we could force migration instead)
@@ -119,33 +473,50 @@ def ingest_gmail_tasks(db: Session):
 def ingest_whatsapp_tasks(db: Session, chat_name: str):
     messages = fetch_whatsapp_messages(chat_name)
     results = []
-    for msg_obj in messages:
-        message = msg_obj["text"]
-        
-        # Use LLM for deadline extraction
-        deadlines = extract_deadlines_with_llm(message)
-        
-        for deadline_info in deadlines:
-            # Check if task already exists
-            task_summary = deadline_info.get("task", message[:100])
-            existing = db.query(Task).filter(Task.summary == task_summary, Task.source == "whatsapp").first()
-            if existing:
+    
+    # Skip messages already extracted in an earlier cycle (by data-id, or content hash without one)
+    keyed = {msg_obj.get("id") or content_key(msg_obj["text"]): msg_obj["text"] for msg_obj in messages}
+    new_keys = unprocessed(db, "whatsapp", chat_name, keyed)
+    texts = [keyed[key] for key in new_keys]
+    if len(texts) < len(messages):
+        print(f"Skipping {len(messages) - len(texts)} already processed WhatsApp messages")
+    
+    # Use LLM for deadline extraction, several messages per request
+    resolved = []
+    all_deadlines = extract_deadlines_batch_with_llm(texts, resolved)
+    # A regex fallback's tasks would be duplicated, worded differently, once the LLM
+    # re-extracts the message, so fallbacks are held back until they're final
+    final_keys = _settle_whatsapp_fallbacks(chat_name, new_keys, resolved)
+    if len(final_keys) < len(new_keys):
+        print(f"Deferring {len(new_keys) - len(final_keys)} WhatsApp messages that fell back to regex")
+    
+    with _task_insert_lock:
+        mark_processed(db, "whatsapp", chat_name, [key for key in new_keys if key in final_keys])
+        for key, message, deadlines in zip(new_keys, texts, all_deadlines):
+            if key not in final_keys:
                 continue
+            for deadline_info in deadlines:
+                # Check if task already exists
+                task_summary = deadline_info.get("task", message[:100])
+                existing = db.query(Task).filter(Task.summary == task_summary, Task.source == "whatsapp").first()
+                if existing:
+                    continue
                 
-            db_task = Task(
-                summary=task_summary,
-                deadline=f"{deadline_info.get('date', '')} {deadline_info.get('time', '')}".strip(),
-                source="whatsapp",
-                alert_status="pending"
-            )
-            db.add(db_task)
-            db.commit()
-            db.refresh(db_task)
-            results.append({
-                "message": message,
-                "deadline": db_task.deadline,
-                "task_id": db_task.id
-            })
+                db_task = Task(
+                    summary=task_summary,
+                    deadline=f"{deadline_info.get('date', '')} {deadline_info.get('time', '')}".strip(),
+                    source="whatsapp",
+                    alert_status="pending"
+                )
+                db.add(db_task)
+                db.commit()
+                db.refresh(db_task)
+                results.append({
+                    "message": message,
+                    "deadline": db_task.deadline,
+                    "task_id": db_task.id
+                })
+        db.commit()
     return results
 
 def check_and_notify_due_soon(db: Session, threshold_minutes: int = 60):
@@ -157,13 +528,14 @@ def check_and_notify_due_soon(db: Session, threshold_minutes: int = 60):
         if not task.deadline:
             continue
         try:
-            parsed = dateparser.parse(
-                task.deadline,
-                settings={
-                    "RETURN_AS_TIMEZONE_AWARE": True,
-                    "PREFER_DATES_FROM": "future",
-                },
-            )
+            with track("dateparser", "parse"):
+                parsed = dateparser.parse(
+                    task.deadline,
+                    settings={
+                        "RETURN_AS_TIMEZONE_AWARE": True,
+                        "PREFER_DATES_FROM": "future",
+                    },
+                )
             if not parsed:
                 continue
                 
@@ -0,0 +1,91 @@
+"""
+Tests for the incremental parser that reads deadlines out of LLM output
+"""
+
+import pytest
+
+from json_stream import DeadlineStreamParser, is_partial, parse_deadlines, parse_grouped_deadlines
+from llm_provider import parse_batch_response, parse_deadline_array
+
+ASSIGNMENT = '{"task": "Submit assignment", "date": "2026-11-20", "time": "23:59"}'
+REGISTRATION = '{"task": "Hackathon registration", "date": "2026-12-01", "time": null}'
+
+
+def test_chatter_around_array_is_ignored():
+    text = f"Sure! Here are the deadlines I found:\n[{ASSIGNMENT}, {REGISTRATION}]\nLet me know if you need more."
+    deadlines, parser = parse_deadlines(text)
+    assert [d["task"] for d in deadlines] == ["Submit assignment", "Hackathon registration"]
+    assert parser.ok
+
+
+def test_bracketed_prose_before_and_after_array():
+    text = f"Deadlines [see below]:\n[{ASSIGNMENT}]\n[end of list]"
+    deadlines, parser = parse_deadlines(text)
+    assert deadlines == [{"task": "Submit assignment", "date": "2026-11-20", "time": "23:59"}]
+    assert parser.ok
+
+
+def test_brackets_inside_strings_do_not_close_the_array():
+    text = '[{"task": "Reply [urgent] to {prof}", "date": "2026-11-20", "time": "hh:mm"}]'
+    deadlines, parser = parse_deadlines(text)
+    assert deadlines == [{"task": "Reply [urgent] to {prof}", "date": "2026-11-20", "time": None}]
+    assert parser.ok
+
+
+def test_objects_split_across_chunks_are_emitted_once_complete():
+    parser = DeadlineStreamParser()
+    text = f"[{ASSIGNMENT}, {REGISTRATION}]"
+    split = text.index("Hackathon")
+    assert [d["task"] for _, d in parser.feed(text[:split])] == ["Submit assignment"]
+    assert [d["task"] for _, d in parser.feed(text[split:])] == ["Hackathon registration"]
+    parser.close()
+    assert parser.ok
+
+
+def test_truncated_array_keeps_complete_objects():
+    text = f'[{ASSIGNMENT}, {{"task": "Hackathon reg'
+    deadlines, parser = parse_deadlines(text)
+    assert [d["task"] for d in deadlines] == ["Submit assignment"]
+    assert parser.truncated
+    assert not parser.ok
+
+
+def test_invalid_objects_are_dropped_and_counted():
+    text = f'[{ASSIGNMENT}, {{"task": "", "date": "2026-11-21"}}, {{"task": "No date"}}]'
+    deadlines, parser = parse_deadlines(text)
+    assert len(deadlines) == 1
+    assert parser.invalid == 2
+    assert not parser.ok
+
+
+def test_batched_object_shape_groups_by_message_id():
+    text = f'Here you go: {{"1": [{ASSIGNMENT}], "2": [], "3": [{REGISTRATION}]}}'
+    grouped, parser = parse_grouped_deadlines(text)
+    assert grouped == {
+        "1": [{"task": "Submit assignment", "date": "2026-11-20", "time": "23:59"}],
+        "2": [],
+        "3": [{"task": "Hackathon registration", "date": "2026-12-01", "time": None}],
+    }
+    assert parser.ok
+
+
+def test_truncated_batch_leaves_out_unfinished_ids():
+    text = f'{{"1": [{ASSIGNMENT}], "2": [{REGISTRATION}, {{"task": "Qu'
+    grouped, parser = parse_grouped_deadlines(text)
+    assert set(grouped) == {"1"}
+    assert parser.complete_keys == {"1"}
+    assert parser.truncated
+    assert parse_batch_response(text, ["1", "2"], "test") == {"1": grouped["1"]}
+
+
+def test_parse_deadline_array_marks_truncated_output_partial():
+    complete = parse_deadline_array(f"[{ASSIGNMENT}]", "test")
+    assert not is_partial(complete)
+    partial = parse_deadline_array(f'[{ASSIGNMENT}, {{"task": "Hack', "test")
+    assert is_partial(partial)
+    assert [d["task"] for d in partial] == ["Submit assignment"]
+
+
+def test_parse_deadline_array_rejects_output_without_json():
+    with pytest.raises(ValueError):
+        parse_deadline_array("I couldn't find any deadlines [sorry].", "test")
@@ -0,0 +1,80 @@
+"""
+Regression harness for batched extraction, driven by recorded LLM responses
+
+ReplayProvider serves the completions from a recordings file, so the full
+extract_deadlines_batch_with_llm path (pre-filter, cache, batching, parsing,
+regex fallback) runs without network access.
+"""
+
+import json
+
+import pytest
+
+import extraction_cache
+from llm_deadline_extractor import extract_deadlines_batch_with_llm, extract_deadlines_with_llm
+from llm_metrics import get_llm_metrics
+from llm_provider import RegexProvider, get_provider_registry
+from replay_provider import ReplayProvider, prompt_hash
+
+TEXTS = [
+    "Reminder: the assignment deadline is 2026-11-20 at 23:59, submit on the portal.",
+    "Hackathon registration closes 2026-12-01, register before then.",
+    "lol see you",
+]
+RECORDED = {
+    "1": [{"task": "Submit assignment", "date": "2026-11-20", "time": "23:59"}],
+    "2": [{"task": "Hackathon registration", "date": "2026-12-01", "time": None}],
+}
+
+
+@pytest.fixture
+def replay_file(tmp_path, monkeypatch):
+    """Recordings for the batch prompt of the two deadline texts, LLM_PROVIDER=replay"""
+    path = tmp_path / "llm_replay.json"
+    prompt = ReplayProvider(path=str(path))._batch_request(TEXTS[:2])[1]
+    path.write_text(json.dumps({prompt_hash(prompt): {"operation": "extract_batch", "response": json.dumps(RECORDED)}}))
+
+    monkeypatch.setenv("LLM_PROVIDER", "replay")
+    monkeypatch.setenv("LLM_REPLAY_PATH", str(path))
+    monkeypatch.setenv("LLM_REPLAY_STRICT", "true")
+    monkeypatch.setattr(extraction_cache, "_cache", extraction_cache.ExtractionCache(path=str(tmp_path / "cache.db")))
+    get_provider_registry().reset()
+    get_llm_metrics().reset()
+    yield path
+    get_provider_registry().reset()
+
+
+def test_batch_extraction_replays_recorded_response(replay_file):
+    resolved = []
+    results = extract_deadlines_batch_with_llm(TEXTS, resolved)
+
+    assert results == [RECORDED["1"], RECORDED["2"], []]
+    assert resolved == [True, True, True]
+    stats = get_provider_registry().get("replay").stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 0
+    assert get_llm_metrics().snapshot()["providers"]["replay"]["extract_batch"]["calls"] == 1
+
+
+def test_injected_failures_fall_back_to_regex(replay_file, monkeypatch):
+    monkeypatch.setenv("LLM_REPLAY_FAILURE_RATE", "1")
+    get_provider_registry().reset()
+
+    resolved = []
+    results = extract_deadlines_batch_with_llm(TEXTS, resolved)
+
+    assert results[:2] == RegexProvider().extract_deadlines_batch(TEXTS[:2])
+    assert results[2] == []
+    # Regex fallbacks are not final: the pre-filtered text is, the others get retried
+    assert resolved == [False, False, True]
+    assert get_provider_registry().get("replay").stats()["injected_failures"] >= 1
+
+
+def test_misconfigured_forced_provider_falls_back_to_regex(replay_file, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "groq")
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+
+    assert extract_deadlines_with_llm(TEXTS[0]) == RegexProvider().extract_deadlines(TEXTS[0])
+    resolved = []
+    assert extract_deadlines_batch_with_llm(TEXTS[:1], resolved) == [RegexProvider().extract_deadlines(TEXTS[0])]
+    assert resolved == [False]
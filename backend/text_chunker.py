@@ -0,0 +1,112 @@
+"""
+Split long messages into overlapping chunks for map-reduce extraction
+
+The extraction prompts only have room for CHUNK_MAX_CHARS of message text.
+Rather than truncating, long texts are cut on paragraph and then sentence
+boundaries into chunks that each fit, with a little overlap so a deadline
+straddling a boundary is still seen whole by one chunk. The per-chunk
+results are merged back with merge_deadlines().
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List
+
+CHUNK_MAX_CHARS = int(os.getenv("LLM_CHUNK_MAX_CHARS", "1000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("LLM_CHUNK_OVERLAP_CHARS", "150"))
+# Upper bound on LLM work per message; chunks past it are dropped
+CHUNK_MAX_COUNT = int(os.getenv("LLM_CHUNK_MAX_COUNT", "6"))
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n")
+
+
+def _pieces(text: str, max_chars: int) -> List[str]:
+    """Sentences (or hard-cut slices of oversized ones), each within max_chars"""
+    pieces = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        sentences = [paragraph] if len(paragraph) <= max_chars else SENTENCE_RE.split(paragraph)
+        for sentence in sentences:
+            sentence = sentence.strip()
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > max_chars // 2 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+        # Keep the paragraph break when pieces are re-joined
+        if pieces:
+            pieces[-1] += "\n\n"
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int = None, overlap: int = None, max_chunks: int = None) -> List[str]:
+    """
+    Split text into at most max_chunks chunks of at most max_chars each
+
+    Short texts come back unchanged as a single chunk. Each chunk after the
+    first starts with up to `overlap` characters of trailing sentences from
+    the previous one.
+    """
+    max_chars = max_chars or CHUNK_MAX_CHARS
+    overlap = CHUNK_OVERLAP_CHARS if overlap is None else overlap
+    max_chunks = max_chunks or CHUNK_MAX_COUNT
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in _pieces(text, max_chars):
+        cost = len(piece) + 1
+        if current and size + cost > max_chars:
+            chunks.append(_join(current))
+            if len(chunks) >= max_chunks:
+                print(f"Message split into more than {max_chunks} chunks; ignoring the rest")
+                return chunks
+            # Carry whole trailing sentences into the next chunk as overlap
+            carried: List[str] = []
+            carried_size = 0
+            for previous in reversed(current):
+                if carried_size + len(previous) + 1 > overlap:
+                    break
+                carried.insert(0, previous)
+                carried_size += len(previous) + 1
+            while carried and carried_size + cost > max_chars:
+                carried_size -= len(carried.pop(0)) + 1
+            current, size = carried, carried_size
+        current.append(piece)
+        size += cost
+    if current:
+        chunks.append(_join(current))
+    return chunks[:max_chunks]
+
+
+def _join(pieces: List[str]) -> str:
+    text = ""
+    for piece in pieces:
+        text += piece if not text or text.endswith("\n") else " " + piece
+    return text.strip()
+
+
+def _task_key(task: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", task.lower()).strip()
+
+
+def merge_deadlines(results: Iterable[List[Dict]]) -> List[Dict]:
+    """Concatenate per-chunk deadlines, dropping duplicates by (task, date)"""
+    merged: Dict[tuple, Dict] = {}
+    for deadlines in results:
+        for deadline in deadlines:
+            key = (_task_key(deadline.get("task", "")), deadline.get("date"))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = deadline
+            elif not existing.get("time") and deadline.get("time"):
+                # The chunk that saw the time wins
+                merged[key] = deadline
+    return list(merged.values())
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from pathlib import Path
 import os
+import threading
 import time
+from contextlib import contextmanager
 from typing import List, Dict, Optional
 
 from selenium import webdriver
@@ -11,7 +13,7 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 
 
@@ -19,6 +21,13 @@ PROFILE_SUBDIR = "whatsapp_profile"
 PROFILE_BASE = Path(os.path.expanduser("~/.deadline_reminder"))
 PROFILE_DIR = PROFILE_BASE / PROFILE_SUBDIR
 
+# Keep the logged-in browser open between runs (false = quit after every scrape)
+WHATSAPP_KEEP_SESSION = os.getenv("WHATSAPP_KEEP_SESSION", "true").lower() != "false"
+WHATSAPP_URL = "https://web.whatsapp.com/"
+
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
 
 def _ensure_profile_dir() -> str:
     PROFILE_BASE.mkdir(parents=True, exist_ok=True)
@@ -94,32 +103,74 @@ def _find_chat(driver, chat_name: str):
     return _find_element_any(driver, candidates, timeout=15)
 
 
-def fetch_whatsapp_messages(chat_name: str, num_messages: int = 10, wait_timeout: int = 120) -> List[Dict]:
+def _message_data_id(msg) -> Optional[str]:
+    """WhatsApp's stable per-message id (data-id on the row), if present."""
+    try:
+        data_id = msg.get_attribute("data-id")
+        if not data_id:
+            data_id = msg.find_element(By.XPATH, './ancestor::div[@data-id][1]').get_attribute("data-id")
+        return data_id or None
+    except Exception:
+        return None
+
+
+def get_chromedriver_path() -> str:
     """
-    Launch WhatsApp Web, ensure session (QR on first run), open chat by name, and
-    return the last N textual messages.
+    Resolve the ChromeDriver binary once per process.
 
-    Session is persisted under ~/.deadline_reminder/whatsapp_profile so you don't
-    have to re-scan the QR each time.
+    ChromeDriverManager().install() does a network version lookup on every
+    call; CHROMEDRIVER_PATH skips it entirely.
     """
-    options = Options()
-    options.add_argument(f"--user-data-dir={_ensure_profile_dir()}")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    # Do NOT run headless for QR login
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+        return _driver_path
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    _log_chrome_version_info(driver)
-    driver.set_window_size(1280, 900)
 
-    try:
-        driver.get("https://web.whatsapp.com/")
-        print("If prompted, scan the QR code with WhatsApp on your phone.")
+class WhatsAppSession:
+    """
+    One long-lived, logged-in WhatsApp Web browser shared by all callers.
+
+    Access is serialized with a lock (the scheduler and /ingest/whatsapp may
+    ask at the same time). The driver is health-checked before each use and
+    relaunched if Chrome crashed or was closed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._driver = None
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+
+    def _launch(self):
+        options = Options()
+        options.add_argument(f"--user-data-dir={_ensure_profile_dir()}")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        # Do NOT run headless for QR login
 
+        driver = webdriver.Chrome(service=Service(get_chromedriver_path()), options=options)
+        _log_chrome_version_info(driver)
+        driver.set_window_size(1280, 900)
+        return driver
+
+    def _is_alive(self) -> bool:
+        if self._driver is None:
+            return False
+        try:
+            # Any round trip to the browser fails once Chrome or the driver is gone
+            return WHATSAPP_URL.rstrip("/") in (self._driver.current_url or "")
+        except Exception:
+            return False
+
+    def _ensure_logged_in(self, wait_timeout: int) -> None:
+        if _get_search_box(self._driver) is not None:
+            return
+        print("If prompted, scan the QR code with WhatsApp on your phone.")
         # Wait until either the search box appears (logged-in state) or timeout
         try:
-            WebDriverWait(driver, wait_timeout).until(
+            WebDriverWait(self._driver, wait_timeout).until(
                 lambda d: _get_search_box(d) is not None
             )
         except TimeoutException:
@@ -127,6 +178,84 @@ def fetch_whatsapp_messages(chat_name: str, num_messages: int = 10, wait_timeout
                 "Timed out waiting for WhatsApp Web login. Please scan the QR and try again."
             )
 
+    @contextmanager
+    def driver(self, wait_timeout: int = 120):
+        """Exclusive access to a healthy, logged-in driver."""
+        with self._lock:
+            launched = False
+            if not self._is_alive():
+                if self._driver is not None:
+                    print("WhatsApp browser session is gone; restarting it")
+                    self.restarts += 1
+                self.close()
+                self._driver = self._launch()
+                self.started_at = time.monotonic()
+                launched = True
+            # Inside the try so a failed page load or login timeout still closes
+            # the browser when sessions are not kept
+            try:
+                if launched:
+                    self._driver.get(WHATSAPP_URL)
+                self._ensure_logged_in(wait_timeout)
+                yield self._driver
+            except WebDriverException:
+                # A crashed browser is relaunched on the next call
+                if not self._is_alive():
+                    self.close()
+                raise
+            finally:
+                if not WHATSAPP_KEEP_SESSION:
+                    self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._driver is not None:
+                try:
+                    self._driver.quit()
+                except Exception:
+                    pass
+            self._driver = None
+            self.started_at = None
+
+    def status(self) -> Dict:
+        """Session state; never waits behind a login or scrape in progress."""
+        busy = not self._lock.acquire(blocking=False)
+        if busy:
+            # The browser is in use, so it was alive moments ago; don't probe it mid-scrape
+            alive = self._driver is not None
+        else:
+            try:
+                alive = self._is_alive()
+            finally:
+                self._lock.release()
+        started_at = self.started_at
+        return {
+            "alive": alive,
+            "busy": busy,
+            "uptime_seconds": round(time.monotonic() - started_at, 1) if started_at else None,
+            "restarts": self.restarts,
+            "keep_session": WHATSAPP_KEEP_SESSION,
+        }
+
+
+_session = WhatsAppSession()
+
+
+def get_whatsapp_session() -> WhatsAppSession:
+    return _session
+
+
+def fetch_whatsapp_messages(chat_name: str, num_messages: int = 10, wait_timeout: int = 120) -> List[Dict]:
+    """
+    Open chat by name in the shared WhatsApp Web session (QR on first run) and
+    return the last N textual messages as {"text", "id"} (id is the row's
+    data-id, or None when it can't be read).
+
+    Session is persisted under ~/.deadline_reminder/whatsapp_profile so you don't
+    have to re-scan the QR each time, and the browser stays open between
+    calls (see WhatsAppSession).
+    """
+    with get_whatsapp_session().driver(wait_timeout) as driver:
         # Find search box and locate the chat
         search_box = _get_search_box(driver)
         if not search_box:
@@ -175,12 +304,6 @@ def fetch_whatsapp_messages(chat_name: str, num_messages: int = 10, wait_timeout
                         text = ""
             text = (text or "").strip()
             if text:
-                results.append({"text": text})
+                results.append({"text": text, "id": _message_data_id(msg)})
 
         return results
-
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass